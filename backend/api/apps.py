@@ -3,3 +3,25 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.signals import user_logged_out
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+        from rest_framework.authtoken.models import Token
+
+        from api import authentication
+        from api.metrics import count_db_connection
+        from backend.db import connect_signals
+
+        connect_signals()
+        connection_created.connect(count_db_connection)
+        post_delete.connect(authentication.token_deleted, sender=Token)
+        post_save.connect(
+            authentication.user_changed, sender=get_user_model()
+        )
+        post_delete.connect(
+            authentication.user_changed, sender=get_user_model()
+        )
+        user_logged_out.connect(authentication.user_logged_out)
@@ -0,0 +1,49 @@
+"""Асинхронные точки входа для ASGI-режима (ASYNC_VIEWS=true).
+
+Каждая - это обычная DRF-вьюха, выполняемая через sync_to_async в
+потоке запроса: аутентификация, права, согласование формата,
+троттлинг, пагинация и формат ошибок те же, что у синхронного API.
+Django 3.2 не умеет асинхронный ORM, поэтому работа с базой в любом
+случае идёт в потоке, а ASGI-сервер тем временем обслуживает другие
+соединения.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+
+from api.views import (IngredientsViewSet, RecipesViewSet, TagsViewSet,
+                       UserViewSet)
+
+
+def async_view(viewset, actions, basename):
+    """Асинхронная обёртка над viewset.as_view(actions).
+
+    Как и роутер, передаёт вьюхе параметры @action: права, пагинацию.
+    """
+    initkwargs = {'basename': basename}
+    for name in set(actions.values()):
+        method = getattr(viewset, name)
+        if hasattr(method, 'mapping'):
+            initkwargs.update(method.kwargs, detail=method.detail)
+    view = viewset.as_view(actions, **initkwargs)
+    sync_view = sync_to_async(view)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await sync_view(request, *args, **kwargs)
+
+    return wrapper
+
+
+tags_list = async_view(TagsViewSet, {'get': 'list'}, 'tags')
+ingredients_list = async_view(
+    IngredientsViewSet, {'get': 'list'}, 'ingredients'
+)
+recipe_detail = async_view(RecipesViewSet, {
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update',
+    'delete': 'destroy',
+}, 'recipes')
+download_shopping_cart = async_view(
+    RecipesViewSet, {'get': 'download_shopping_cart'}, 'recipes'
+)
+subscriptions = async_view(UserViewSet, {'get': 'subscriptions'}, 'users')
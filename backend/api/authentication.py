@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.cache import LRUCache
+from api.metrics import cache_requests
+from users.models import User
+
+CACHE_KEY = 'auth-token:{}'
+VERSION_KEY = 'auth-user-version:{}'
+USER_FIELDS = tuple(field.attname for field in User._meta.concrete_fields)
+
+token_cache = LRUCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+def shared_cache():
+    alias = settings.TOKEN_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def user_version(cache, user_id):
+    return cache.get(VERSION_KEY.format(user_id), 0)
+
+
+def invalidate_tokens(keys=(), user_id=None):
+    """Сбрасывает закэшированные токены по ключам и/или пользователю.
+
+    Версия пользователя в общем кэше делает устаревшими записи всех
+    процессов: они сверяют её при каждом попадании.
+    """
+    if user_id is not None:
+        token_cache.delete_where(lambda entry: entry[0] == user_id)
+    for key in keys:
+        token_cache.delete(key)
+    cache = shared_cache()
+    if cache is None:
+        return
+    if keys:
+        cache.delete_many([CACHE_KEY.format(key) for key in keys])
+    if user_id is not None:
+        version_key = VERSION_KEY.format(user_id)
+        cache.add(version_key, 0, None)
+        cache.incr(version_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к authtoken_token на каждый вызов.
+
+    Работает, только если задан TOKEN_CACHE_ALIAS с общим для всех
+    воркеров кэшем, иначе каждый запрос проверяет токен по базе. По ключу
+    токена хранятся id, версия и значения полей пользователя - в LRU-кэше
+    процесса и в общем кэше. При каждом попадании версия сверяется с
+    общим кэшем, где её сдвигают сигналы удаления токена и изменения
+    пользователя, так что отзыв действует сразу во всех процессах.
+    Каждый запрос получает собственный объект User.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = shared_cache()
+        if cache is None:
+            return super().authenticate_credentials(key)
+        entry = token_cache.get(key)
+        if entry is not None and entry[1] == user_version(cache, entry[0]):
+            cache_requests.inc(cache='auth_token', result='hit')
+        else:
+            entry = self.load_entry(cache, key)
+            token_cache.set(key, entry)
+        user = User.from_db(
+            router.db_for_read(User), USER_FIELDS, entry[2]
+        )
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return user, Token(key=key, user=user)
+
+    def load_entry(self, cache, key):
+        """(id, версия, поля) пользователя из общего кэша или базы."""
+        cache_key = CACHE_KEY.format(key)
+        entry = cache.get(cache_key)
+        if entry is not None and entry[1] == user_version(cache, entry[0]):
+            cache_requests.inc(cache='auth_token', result='shared_hit')
+            return entry
+        cache_requests.inc(cache='auth_token', result='miss')
+        try:
+            user_id = Token.objects.values_list(
+                'user_id', flat=True
+            ).get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        # Версия читается до пользователя: изменение между ними лишь
+        # приведёт к повторной загрузке.
+        version = user_version(cache, user_id)
+        user, _token = super().authenticate_credentials(key)
+        entry = (
+            user.pk, version,
+            tuple(getattr(user, name) for name in USER_FIELDS)
+        )
+        cache.set(cache_key, entry, settings.TOKEN_CACHE_TTL)
+        return entry
+
+
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens(keys=[instance.key], user_id=instance.user_id)
+
+
+def user_changed(sender, instance, **kwargs):
+    invalidate_tokens(user_id=instance.pk)
+
+
+def user_logged_out(sender, request, user, **kwargs):
+    invalidate_tokens(user_id=user.pk)
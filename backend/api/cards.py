@@ -0,0 +1,124 @@
+"""Карточки рецептов: денормализованная часть ответа RecipesGetSerializer.
+
+Карточка хранит всё, кроме полей, зависящих от пользователя, и номер
+версии - updated_at рецепта, из которого она собрана. Любое изменение
+рецепта, его тегов, ингредиентов или имени автора сдвигает updated_at
+в той же транзакции, поэтому устаревшая карточка видна по несовпадению
+версии и пересобирается при чтении. Теги и ингредиенты хранятся только
+id (с количеством для ингредиентов), а строки справочников берутся из
+api.reference при отдаче: их правки, в том числе массовые загрузки, не
+требуют пересборки карточек. Страница ленты читается из одной таблицы,
+а флаги пользователя добавляются тремя запросами на страницу.
+"""
+from api import reference
+from api.serializers import (RecipesGetSerializer, ReferenceIngredientsField,
+                             ReferenceTagsField, UserSerializer)
+from recipes.models import RecipeCard, Recipes
+
+PER_USER_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+RESPONSE_FIELDS = RecipesGetSerializer.Meta.fields
+
+
+class CardAuthorSerializer(UserSerializer):
+
+    class Meta(UserSerializer.Meta):
+        fields = tuple(
+            name for name in UserSerializer.Meta.fields
+            if name != 'is_subscribed'
+        )
+
+
+class IngredientRowsField(ReferenceIngredientsField):
+    """Пары (id ингредиента, количество) без строк справочника."""
+
+    def to_representation(self, recipe):
+        return [list(row) for row in recipe.ingredient_rows]
+
+
+class RecipeCardSerializer(RecipesGetSerializer):
+    tags = ReferenceTagsField(collapsed=True)
+    author = CardAuthorSerializer(read_only=True)
+    ingredients = IngredientRowsField(collapsed=True)
+
+    class Meta(RecipesGetSerializer.Meta):
+        fields = tuple(
+            name for name in RecipesGetSerializer.Meta.fields
+            if name not in PER_USER_FIELDS
+        )
+
+
+def build_cards(recipe_ids):
+    """Собирает и сохраняет карточки рецептов recipe_ids."""
+    recipes = list(Recipes.objects.filter(pk__in=recipe_ids).select_related(
+        'author'
+    ))
+    cards = [
+        RecipeCard(recipe_id=recipe.pk, version=recipe.updated_at, data=data)
+        for recipe, data in zip(
+            recipes, RecipeCardSerializer(recipes, many=True).data
+        )
+    ]
+    RecipeCard.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeCard.objects.bulk_create(cards, ignore_conflicts=True)
+    return {card.recipe_id: card.data for card in cards}
+
+
+def get_cards(rows):
+    """Актуальные карточки для строк (pk, updated_at, author_id)."""
+    versions = {pk: updated_at for pk, updated_at, _ in rows}
+    cards = {
+        recipe_id: data for recipe_id, data, version in
+        RecipeCard.objects.filter(recipe_id__in=versions).values_list(
+            'recipe_id', 'data', 'version'
+        ) if version == versions[recipe_id]
+    }
+    stale = [pk for pk in versions if pk not in cards]
+    if stale:
+        cards.update(build_cards(stale))
+    return cards
+
+
+def card_response_data(request, rows, state):
+    """Данные страницы в формате RecipesGetSerializer.
+
+    state - избранное, корзина и подписки пользователя из user_state()
+    или None для анонима.
+    """
+    favorites, cart, subscriptions = (
+        map(set, state) if state is not None else (set(), set(), set())
+    )
+    cards = get_cards(rows)
+    versions = reference.current_versions()
+    tags = reference.tags.get_many(
+        {pk for card in cards.values() for pk in card['tags']}, versions
+    )
+    ingredients = reference.ingredients.get_many(
+        {pk for card in cards.values() for pk, _ in card['ingredients']},
+        versions
+    )
+    data = []
+    for pk, _, author_id in rows:
+        if pk not in cards:
+            # Рецепт удалён после выборки страницы.
+            continue
+        card = cards[pk]
+        response = {
+            **card,
+            'tags': [dict(tags[tag]) for tag in card['tags'] if tag in tags],
+            'author': {
+                **card['author'], 'is_subscribed': author_id in subscriptions
+            },
+            'ingredients': [
+                {**ingredients[ingredient], 'amount': amount}
+                for ingredient, amount in card['ingredients']
+                if ingredient in ingredients
+            ],
+            'image': card['image'] and request.build_absolute_uri(
+                card['image']
+            ),
+            'is_favorited': pk in favorites,
+            'is_in_shopping_cart': pk in cart,
+        }
+        # Порядок ключей как у сериализатора: jsonb его не хранит.
+        data.append({name: response[name] for name in RESPONSE_FIELDS})
+    return data
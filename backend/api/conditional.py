@@ -0,0 +1,85 @@
+"""Условные GET для рецептов по updated_at.
+
+Валидатор строится до сериализации из лёгкого запроса (id, updated_at,
+author_id) по странице или одному рецепту. В ответе есть ещё поля,
+зависящие от пользователя (is_favorited, is_in_shopping_cart,
+is_subscribed), поэтому для авторизованных ETag учитывает и их, а
+Last-Modified отдаётся только анонимам.
+"""
+import hashlib
+import json
+
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from recipes.models import Cart, Favorite
+from users.models import Subscribe
+
+VALIDATOR_FIELDS = ('pk', 'updated_at', 'author_id')
+
+
+def user_state(user, rows):
+    """Избранное, корзина и подписки пользователя в пределах строк."""
+    recipe_ids = [pk for pk, _, _ in rows]
+    author_ids = {author_id for _, _, author_id in rows}
+    return [
+        sorted(model.objects.filter(
+            user=user, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+        for model in (Favorite, Cart)
+    ] + [sorted(Subscribe.objects.filter(
+        user=user, author_id__in=author_ids
+    ).values_list('author_id', flat=True))]
+
+
+def recipe_rows(queryset, pk):
+    """Строки VALIDATOR_FIELDS одного рецепта, некорректный pk - 404."""
+    try:
+        return list(queryset.filter(pk=pk).values_list(*VALIDATOR_FIELDS))
+    except (TypeError, ValueError):
+        raise Http404
+
+
+def recipe_validators(request, rows, *extra, state=None):
+    """ETag и время последнего изменения для строк VALIDATOR_FIELDS.
+
+    state - уже посчитанный user_state() для авторизованного пользователя.
+    """
+    parts = [
+        request.accepted_renderer.format, *extra,
+        [(pk, updated_at.isoformat()) for pk, updated_at, _ in rows],
+    ]
+    last_modified = None
+    if request.user.is_authenticated:
+        if state is None:
+            state = user_state(request.user, rows)
+        parts += [request.user.pk, state]
+    elif rows:
+        last_modified = int(max(
+            updated_at for _, updated_at, _ in rows
+        ).timestamp())
+    return make_etag(parts), last_modified
+
+
+def make_etag(parts):
+    """ETag по json-сериализуемому списку частей ответа."""
+    return quote_etag(hashlib.sha1(json.dumps(parts).encode()).hexdigest())
+
+
+def not_modified(request, etag, last_modified):
+    """304, если копия клиента актуальна, иначе None."""
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    return response
@@ -0,0 +1,157 @@
+"""Замер времени и запросов к БД для каждого запроса к API.
+
+Включается настройкой REQUEST_INSTRUMENTATION. Итоги пишутся в заголовок
+Server-Timing, а агрегированная статистика по вьюхам копится в памяти
+процесса и периодически сбрасывается в REQUEST_STATS_DIR, откуда её
+читает команда request_stats.
+"""
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+FLUSH_EVERY = 100
+TOP_DUPLICATES = 10
+
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBER_RE = re.compile(r'\b\d+\b')
+
+
+def fingerprint(sql):
+    """Нормализует SQL, чтобы одинаковые по форме запросы совпадали."""
+    return NUMBER_RE.sub('N', IN_LIST_RE.sub('IN (...)', sql))
+
+
+def empty_stats():
+    return {
+        'count': 0, 'wall_ms': 0.0, 'db_ms': 0.0, 'queries': 0,
+        'max_queries': 0, 'buckets': [0] * len(BUCKETS_MS), 'duplicates': {},
+    }
+
+
+class QueryRecorder:
+    """execute_wrapper, копящий время и отпечатки выполненных запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start_time = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start_time
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.fingerprints.items()
+                if count > 1}
+
+
+class RequestStats:
+    """Агрегированная по вьюхам статистика текущего процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.requests = 0
+
+    def record(self, view_name, wall_ms, db_ms, recorder):
+        with self.lock:
+            stats = self.views.setdefault(view_name, empty_stats())
+            stats['count'] += 1
+            stats['wall_ms'] += wall_ms
+            stats['db_ms'] += db_ms
+            stats['queries'] += recorder.count
+            stats['max_queries'] = max(stats['max_queries'], recorder.count)
+            stats['buckets'][next(
+                index for index, bound in enumerate(BUCKETS_MS)
+                if wall_ms <= bound
+            )] += 1
+            duplicates = Counter(stats['duplicates'])
+            duplicates.update(recorder.duplicates)
+            stats['duplicates'] = dict(
+                duplicates.most_common(TOP_DUPLICATES)
+            )
+            self.requests += 1
+            flush = self.requests % FLUSH_EVERY == 0
+        if flush:
+            self.flush()
+
+    def flush(self):
+        directory = settings.REQUEST_STATS_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        with self.lock:
+            data = json.dumps(self.views, ensure_ascii=False)
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+            file.write(data)
+        os.replace(f'{path}.tmp', path)
+
+
+request_stats = RequestStats()
+
+
+def load_stats(directory):
+    """Объединяет статистику, сброшенную всеми процессами."""
+    merged = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, name), encoding='utf-8') as file:
+            for view_name, stats in json.load(file).items():
+                total = merged.setdefault(view_name, empty_stats())
+                for key in ('count', 'wall_ms', 'db_ms', 'queries'):
+                    total[key] += stats[key]
+                total['max_queries'] = max(
+                    total['max_queries'], stats['max_queries']
+                )
+                total['buckets'] = [
+                    old + new
+                    for old, new in zip(total['buckets'], stats['buckets'])
+                ]
+                total['duplicates'] = dict(Counter(total['duplicates'])
+                                           + Counter(stats['duplicates']))
+    return merged
+
+
+class QueryInstrumentationMiddleware:
+    """Время запроса, время и число запросов к БД, повторяющиеся запросы."""
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        atexit.register(request_stats.flush)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start_time = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - start_time) * 1000
+        db_ms = recorder.duration * 1000
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        request_stats.record(view_name, wall_ms, db_ms, recorder)
+        response['Server-Timing'] = ', '.join((
+            f'total;dur={wall_ms:.1f}',
+            f'db;dur={db_ms:.1f};desc="{recorder.count} queries"',
+            f'dup;desc="{sum(recorder.duplicates.values())} duplicated"',
+        ))
+        return response
@@ -0,0 +1,146 @@
+import json
+import statistics
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredients, Recipes, Tags
+from users.models import User
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, round(percent / 100 * (len(values) - 1)))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = ('Замер задержек и числа запросов к БД для эндпоинтов API через '
+            'тестовый клиент Django. Запуск: python manage.py bench_api '
+            '--requests 50 --output bench.json.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Количество запросов на эндпоинт.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Количество прогревочных запросов без замера.'
+        )
+        parser.add_argument(
+            '--user', help='Email пользователя для авторизованных запросов.'
+        )
+        parser.add_argument('--output', help='Файл отчёта в JSON.')
+        parser.add_argument(
+            '--baseline', help='Отчёт предыдущего прогона для сравнения.'
+        )
+
+    def handle(self, *args, **options):
+        recipe = Recipes.objects.order_by('id').first()
+        if recipe is None:
+            raise CommandError(
+                'Нет рецептов: запустите python manage.py generate_fake_data.'
+            )
+        user = self.get_user(options['user'])
+        client = Client(HTTP_AUTHORIZATION=(
+            f'Token {Token.objects.get_or_create(user=user)[0].key}'
+        ))
+        report = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, url in self.get_endpoints(recipe).items():
+                report[name] = self.measure(
+                    client, url, options['requests'], options['warmup']
+                )
+                self.print_row(name, report[name])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2, sort_keys=True)
+        if options['baseline']:
+            self.compare(report, options['baseline'])
+
+    @staticmethod
+    def get_user(email):
+        if email:
+            return User.objects.get(email=email)
+        user = User.objects.annotate(
+            carts=Count('cart', distinct=True),
+            subscriptions=Count('follower', distinct=True),
+        ).order_by('-carts', '-subscriptions').first()
+        if user is None:
+            raise CommandError('Нет пользователей для авторизации.')
+        return user
+
+    @staticmethod
+    def get_endpoints(recipe):
+        tag = Tags.objects.order_by('id').values_list('slug', flat=True)
+        ingredient = Ingredients.objects.values_list('name', flat=True)
+        return {
+            'tags-list': '/api/tags/',
+            'ingredients-list': (
+                f'/api/ingredients/?name={(ingredient.first() or "")[:2]}'
+            ),
+            'recipes-list': '/api/recipes/',
+            'recipes-list-tags': f'/api/recipes/?tags={tag.first()}',
+            'recipes-list-favorited': '/api/recipes/?is_favorited=1',
+            'recipes-detail': f'/api/recipes/{recipe.id}/',
+            'users-list': '/api/users/',
+            'users-me': '/api/users/me/',
+            'users-subscriptions': '/api/users/subscriptions/',
+            'recipes-download-shopping-cart': (
+                '/api/recipes/download_shopping_cart/'
+            ),
+        }
+
+    @staticmethod
+    def measure(client, url, requests, warmup):
+        for _ in range(warmup):
+            client.get(url)
+        timings, queries, statuses, sizes = [], [], set(), []
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as context:
+                start_time = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start_time) * 1000)
+            queries.append(len(context.captured_queries))
+            statuses.add(response.status_code)
+            sizes.append(len(b''.join(response)))
+        result = {
+            f'p{percent}_ms': round(percentile(timings, percent), 2)
+            for percent in PERCENTILES
+        }
+        result.update(
+            url=url, requests=requests,
+            mean_ms=round(statistics.mean(timings), 2),
+            queries=max(queries), response_bytes=max(sizes),
+            status_codes=sorted(statuses),
+        )
+        return result
+
+    def print_row(self, name, result):
+        self.stdout.write(
+            f'{name:<32} p50 {result["p50_ms"]:>8.2f} мс  '
+            f'p95 {result["p95_ms"]:>8.2f} мс  '
+            f'запросов {result["queries"]:>4}  '
+            f'статус {result["status_codes"]}'
+        )
+
+    def compare(self, report, path):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        self.stdout.write(f'Сравнение с {path}:')
+        for name, result in report.items():
+            old = baseline.get(name)
+            if old is None:
+                continue
+            self.stdout.write(
+                f'{name:<32} p50 {result["p50_ms"] - old["p50_ms"]:>+8.2f} мс'
+                f'  запросов {result["queries"] - old["queries"]:>+4}'
+            )
@@ -0,0 +1,106 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.management import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Recipes
+from users.models import User
+
+
+def build_urlconf(async_views):
+    """Корневой URLconf с асинхронными вьюхами API или без них."""
+    from api import urls
+
+    module = ModuleType(f'bench_urls_{"async" if async_views else "sync"}')
+    patterns = [
+        pattern for pattern in urls.urlpatterns
+        if pattern not in urls.async_urlpatterns
+    ]
+    if async_views:
+        patterns = urls.async_urlpatterns + patterns
+    module.urlpatterns = [path('api/', include(patterns))]
+    return module
+
+
+class Command(BaseCommand):
+    help = ('Пропускная способность WSGI (синхронные вьюсеты DRF, пул '
+            'потоков) против ASGI (асинхронные вьюхи) при конкурентной '
+            'нагрузке. Запуск: python manage.py bench_asgi --concurrency 16.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def handle(self, *args, **options):
+        recipe = Recipes.objects.order_by('id').first()
+        user = User.objects.filter(follower__isnull=False).first()
+        if recipe is None or user is None:
+            raise CommandError(
+                'Нет данных: запустите python manage.py generate_fake_data.'
+            )
+        token = Token.objects.get_or_create(user=user)[0].key
+        urls = (
+            '/api/tags/', '/api/ingredients/?name=а',
+            f'/api/recipes/{recipe.id}/', '/api/users/subscriptions/',
+        )
+        for url in urls:
+            wsgi = self.run_wsgi(url, token, options)
+            asgi = self.run_asgi(url, token, options)
+            self.stdout.write(
+                f'{url:<32} WSGI {wsgi:>8.1f} зап/с   ASGI {asgi:>8.1f} '
+                f'зап/с   x{asgi / wsgi:.2f}'
+            )
+
+    def run_wsgi(self, url, token, options):
+        client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+
+        def call(_):
+            response = client.get(url)
+            close_old_connections()
+            return response.status_code
+
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'], ROOT_URLCONF=build_urlconf(False)
+        ), ThreadPoolExecutor(options['concurrency']) as executor:
+            call(None)
+            start_time = time.perf_counter()
+            statuses = set(executor.map(call, range(options['requests'])))
+            elapsed = time.perf_counter() - start_time
+        self.check_statuses(url, 'WSGI', statuses)
+        return options['requests'] / elapsed
+
+    def run_asgi(self, url, token, options):
+        client = AsyncClient()
+        # AsyncClient в Django 3.2 принимает заголовки только у запроса.
+        headers = {'authorization': f'Token {token}'}
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def call():
+            async with semaphore, ThreadSensitiveContext():
+                return (await client.get(url, **headers)).status_code
+
+        async def run():
+            await call()
+            start_time = time.perf_counter()
+            statuses = set(await asyncio.gather(
+                *(call() for _ in range(options['requests']))
+            ))
+            return statuses, time.perf_counter() - start_time
+
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'], ROOT_URLCONF=build_urlconf(True)
+        ):
+            statuses, elapsed = asyncio.run(run())
+        self.check_statuses(url, 'ASGI', statuses)
+        return options['requests'] / elapsed
+
+    def check_statuses(self, url, mode, statuses):
+        if statuses != {200}:
+            self.stderr.write(f'{mode} {url}: статусы ответов {statuses}')
@@ -0,0 +1,59 @@
+import statistics
+import time
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+
+
+class Command(BaseCommand):
+    help = ('Накладные расходы на соединение с БД: запросы к API без '
+            'постоянных соединений (CONN_MAX_AGE=0) и с ними. Запуск: '
+            'python manage.py bench_db_connections --requests 200.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--url', default='/api/tags/')
+        parser.add_argument(
+            '--max-age', type=int, default=600,
+            help='CONN_MAX_AGE для прогона с постоянными соединениями.'
+        )
+
+    def handle(self, *args, **options):
+        original_max_age = connection.settings_dict['CONN_MAX_AGE']
+        try:
+            for max_age in (0, options['max_age']):
+                self.run(max_age, options['url'], options['requests'])
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = original_max_age
+
+    def run(self, max_age, url, requests):
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        opened = []
+
+        def count(sender, **kwargs):
+            opened.append(sender)
+
+        connection_created.connect(count)
+        # Тестовый клиент отключает close_old_connections, поэтому
+        # закрываем соединения сами, как это делает WSGIHandler.
+        client = Client()
+        timings = []
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            client.get(url)
+            for _ in range(requests):
+                start_time = time.perf_counter()
+                client.get(url)
+                close_old_connections()
+                timings.append((time.perf_counter() - start_time) * 1000)
+        connection_created.disconnect(count)
+        timings.sort()
+        self.stdout.write(
+            f'CONN_MAX_AGE={max_age:<5} {connection.vendor}: '
+            f'среднее {statistics.mean(timings):.2f} мс, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} мс, '
+            f'новых соединений {len(opened)}'
+        )
@@ -0,0 +1,74 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.projections import project
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import (IngredientsSerializer, RecipesGetSerializer,
+                             ShortSerializer, TagsSerializer)
+from recipes.models import Ingredients, Recipes, Tags
+
+
+class Command(BaseCommand):
+    help = ('Строк в секунду для сериализации и рендеринга списков: '
+            'ModelSerializer + JSONRenderer против values() + orjson. '
+            'Запуск: python manage.py bench_serialization --repeat 20.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--recipes', type=int, default=100,
+            help='Размер страницы рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        if not Ingredients.objects.exists():
+            raise CommandError(
+                'Нет данных: запустите python manage.py load_csv_data.'
+            )
+        if orjson is None:
+            self.stderr.write('orjson не установлен, замер без него.')
+        request = APIRequestFactory().get('/')
+        request.user = AnonymousUser()
+        recipes = Recipes.objects.order_by('-pub_date')[:options['recipes']]
+        cases = (
+            ('ingredients', Ingredients.objects.all(), IngredientsSerializer),
+            ('tags', Tags.objects.all(), TagsSerializer),
+            ('recipes short', recipes, ShortSerializer),
+            ('recipes full', recipes.select_related('author').prefetch_related(
+                'tags', 'ingredientinrecipe_set__ingredient'
+            ), RecipesGetSerializer),
+        )
+        self.stdout.write(
+            f'{"":<16}{"serializer":>14}{"+ orjson":>14}'
+            f'{"values()":>14}{"+ orjson":>14}  строк/с'
+        )
+        for name, queryset, serializer_class in cases:
+            results = [
+                self.measure(
+                    queryset, serializer_class, request, fast, renderer,
+                    options['repeat']
+                )
+                for fast in (False, True)
+                for renderer in (JSONRenderer(), FastJSONRenderer())
+            ]
+            self.stdout.write(f'{name:<16}' + ''.join(
+                f'{rate:>14.0f}' for rate in results
+            ))
+
+    @staticmethod
+    def measure(queryset, serializer_class, request, fast, renderer, repeat):
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'], FAST_SERIALIZATION=fast
+        ):
+            rows = 0
+            start_time = time.perf_counter()
+            for _ in range(repeat):
+                data = project(queryset.all(), serializer_class, request)
+                renderer.render(data)
+                rows += len(data)
+        return rows / (time.perf_counter() - start_time)
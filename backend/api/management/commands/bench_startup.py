@@ -0,0 +1,128 @@
+import json
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+# Библиотеки, которые должны загружаться только при первом использовании.
+LAZY_MODULES = ('reportlab',)
+
+# Выполняется в отдельном процессе с -X importtime, чтобы мерить
+# холодный старт, а не уже загруженный django.
+SCRIPT = '''
+import json, sys, time
+start_time = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter() - start_time
+from django.test import Client, override_settings
+client = Client()
+with override_settings(ALLOWED_HOSTS=['testserver']):
+    start_time = time.perf_counter()
+    status = client.get(sys.argv[1]).status_code
+    first = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    client.get(sys.argv[1])
+    second = time.perf_counter() - start_time
+print(json.dumps({
+    'setup': setup * 1000, 'first': first * 1000, 'second': second * 1000,
+    'status': status,
+    'lazy': [name for name in sys.argv[2:] if name in sys.modules],
+}))
+'''
+
+
+def parse_importtime(output):
+    """Собственное время импорта в мс, сгруппированное по пакетам."""
+    packages = Counter()
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(own) / 1000
+    return packages
+
+
+class Command(BaseCommand):
+    help = ('Время холодного старта воркера: django.setup(), первый и '
+            'второй запрос, разбивка импорта по пакетам (-X importtime). '
+            'С порогами завершается ошибкой при регрессии. '
+            'Запуск: python manage.py bench_startup --repeat 5.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--url', default='/api/recipes/')
+        parser.add_argument(
+            '--top', type=int, default=15,
+            help='Сколько самых медленных пакетов показать.'
+        )
+        parser.add_argument(
+            '--max-setup-ms', type=float,
+            help='Порог медианы django.setup() в мс.'
+        )
+        parser.add_argument(
+            '--max-first-request-ms', type=float,
+            help='Порог медианы первого запроса в мс.'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше нуля.')
+        runs = [self.run(options['url']) for _ in range(options['repeat'])]
+        medians = {
+            key: statistics.median(run[key] for run, _ in runs)
+            for key in ('setup', 'first', 'second')
+        }
+        self.stdout.write(
+            f'django.setup() {medians["setup"]:.1f} мс, первый запрос '
+            f'{options["url"]} {medians["first"]:.1f} мс '
+            f'(статус {runs[0][0]["status"]}), второй '
+            f'{medians["second"]:.1f} мс, медиана {len(runs)} запусков.'
+        )
+        packages = {
+            name: statistics.median(
+                imports.get(name, 0) for _, imports in runs
+            )
+            for name in set().union(*(imports for _, imports in runs))
+        }
+        self.stdout.write(
+            f'Импорт всего {sum(packages.values()):.1f} мс, по пакетам:'
+        )
+        for name, own in sorted(
+            packages.items(), key=lambda item: item[1], reverse=True
+        )[:options['top']]:
+            self.stdout.write(f'{own:>10.1f} мс  {name}')
+        errors = []
+        loaded = sorted(set().union(*(run['lazy'] for run, _ in runs)))
+        if loaded:
+            errors.append(
+                f'При старте загружены ленивые модули: {", ".join(loaded)}.'
+            )
+        for key, option in (
+            ('setup', 'max_setup_ms'), ('first', 'max_first_request_ms')
+        ):
+            limit = options[option]
+            if limit is not None and medians[key] > limit:
+                errors.append(
+                    f'--{option.replace("_", "-")}: {medians[key]:.1f} мс '
+                    f'больше порога {limit:.1f} мс.'
+                )
+        if errors:
+            raise CommandError(' '.join(errors))
+
+    @staticmethod
+    def run(url):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT, url,
+             *LAZY_MODULES],
+            capture_output=True, text=True, cwd=settings.BASE_DIR,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        return (
+            json.loads(result.stdout.strip().splitlines()[-1]),
+            parse_importtime(result.stderr),
+        )
@@ -0,0 +1,61 @@
+import io
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from api.profiling import list_captures
+
+
+class Command(BaseCommand):
+    help = ('Список и сводка профилей запросов, снятых ProfilingMiddleware. '
+            'Запуск: python manage.py profiles [--show ID].')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--show', help='Идентификатор снимка.')
+        parser.add_argument(
+            '--sort', default='cumulative',
+            help='Поле сортировки pstats: cumulative, tottime, calls.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=30,
+            help='Количество строк в сводке.'
+        )
+
+    def handle(self, *args, **options):
+        captures = list_captures(settings.PROFILING_DIR)
+        if not options['show']:
+            for capture in captures:
+                self.stdout.write(
+                    f'{capture["id"]:<60} {capture["method"]:<6} '
+                    f'{capture["status"]} {capture["duration_ms"]:>9.1f} мс '
+                    f'{capture["path"]}'
+                )
+            if not captures:
+                self.stdout.write('Снимков нет.')
+            return
+        capture = next(
+            (item for item in captures if item['id'] == options['show']), None
+        )
+        if capture is None:
+            raise CommandError(f'Снимок {options["show"]} не найден.')
+        self.stdout.write(
+            f'{capture["method"]} {capture["path"]} -> {capture["status"]}, '
+            f'{capture["duration_ms"]} мс, пик памяти '
+            f'{capture["peak_memory_kb"]} КБ'
+        )
+        output = io.StringIO()
+        pstats.Stats(
+            os.path.join(settings.PROFILING_DIR, f'{capture["id"]}.prof'),
+            stream=output
+        ).strip_dirs().sort_stats(options['sort']).print_stats(
+            options['limit']
+        )
+        self.stdout.write(output.getvalue())
+        self.stdout.write('Аллокации за время запроса:')
+        for allocation in capture['allocations']:
+            self.stdout.write(
+                f'{allocation["size_kb"]:>10.1f} КБ '
+                f'{allocation["count"]:>7} {allocation["line"]}'
+            )
@@ -0,0 +1,68 @@
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from api.instrumentation import BUCKETS_MS, load_stats
+
+
+def bucket_percentile(buckets, percent):
+    """Верхняя граница корзины гистограммы, в которую попал перцентиль."""
+    threshold = sum(buckets) * percent / 100
+    total = 0
+    for bound, count in zip(BUCKETS_MS, buckets):
+        total += count
+        if total >= threshold:
+            return bound
+    return BUCKETS_MS[-1]
+
+
+class Command(BaseCommand):
+    help = ('Сводка по времени и запросам к БД для вьюх, собранная '
+            'QueryInstrumentationMiddleware. Запуск: '
+            'python manage.py request_stats.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sort', choices=('count', 'wall_ms', 'db_ms', 'queries'),
+            default='wall_ms', help='Поле для сортировки вьюх.'
+        )
+        parser.add_argument(
+            '--duplicates', action='store_true',
+            help='Показать повторяющиеся запросы для каждой вьюхи.'
+        )
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Удалить накопленную статистику.'
+        )
+
+    def handle(self, *args, **options):
+        directory = settings.REQUEST_STATS_DIR
+        if options['reset']:
+            shutil.rmtree(directory, ignore_errors=True)
+            self.stdout.write('Статистика очищена.')
+            return
+        if not os.path.isdir(directory):
+            self.stdout.write('Статистика ещё не собрана.')
+            return
+        views = load_stats(directory)
+        self.stdout.write(
+            f'{"view":<40}{"count":>8}{"avg ms":>10}{"p95 ms":>10}'
+            f'{"db ms":>10}{"queries":>9}{"max q":>7}'
+        )
+        for name, stats in sorted(
+            views.items(), key=lambda item: -item[1][options['sort']]
+        ):
+            count = stats['count']
+            self.stdout.write(
+                f'{name:<40}{count:>8}{stats["wall_ms"] / count:>10.1f}'
+                f'{bucket_percentile(stats["buckets"], 95):>10}'
+                f'{stats["db_ms"] / count:>10.1f}'
+                f'{stats["queries"] / count:>9.1f}{stats["max_queries"]:>7}'
+            )
+            if options['duplicates']:
+                for sql, repeats in sorted(
+                    stats['duplicates'].items(), key=lambda item: -item[1]
+                ):
+                    self.stdout.write(f'    x{repeats} {sql[:200]}')
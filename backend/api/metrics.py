@@ -0,0 +1,321 @@
+"""Счётчики и гистограммы в текстовом формате Prometheus.
+
+Каждый процесс gunicorn копит значения в памяти, а фоновый поток раз в
+METRICS_FLUSH_INTERVAL секунд сбрасывает их в файл процесса в
+METRICS_DIR. Имя файла - pid и время старта, поэтому процесс с тем же
+pid не перезаписывает чужие значения. Файлы завершившихся процессов
+сливаются в archive.json и удаляются, так что счётчики не убывают после
+перезапуска воркеров. Вьюха /metrics суммирует архив и файлы живых
+процессов, внешний сервис для агрегации не нужен.
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf')
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', r'\\').replace('"', r'\"')
+        ) for name, value in labels
+    )
+    return f'{{{pairs}}}'
+
+
+ARCHIVE = 'archive.json'
+LOCK = 'archive.lock'
+
+
+def read_samples(path, samples):
+    with open(path, encoding='utf-8') as file:
+        for sample, labels, value in json.load(file):
+            key = (sample, tuple(tuple(pair) for pair in labels))
+            samples[key] = samples.get(key, 0) + value
+
+
+def write_samples(path, samples):
+    data = json.dumps([
+        [name, labels, value] for (name, labels), value in samples.items()
+    ])
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+        file.write(data)
+    os.replace(f'{path}.tmp', path)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def archive_lock(directory):
+    """Блокировка архива между процессами."""
+    with open(os.path.join(directory, LOCK), 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+class Registry:
+    """Метрики процесса и их значения, сгруппированные по сэмплам."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.samples = {}
+        # pid и время старта процесса, копящего сэмплы.
+        self.owner = None
+        atexit.register(self.close)
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def add(self, name, labels, amount):
+        if not settings.METRICS_ENABLED:
+            return
+        with self.lock:
+            if self.owner is None or self.owner[0] != os.getpid():
+                self.start()
+            key = (name, labels)
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+    def start(self):
+        """Начинает учёт в текущем процессе, в том числе после fork."""
+        self.samples = {}
+        self.owner = (os.getpid(), time.time_ns())
+        threading.Thread(
+            target=self.flush_periodically, name='metrics-flush', daemon=True
+        ).start()
+
+    def flush_periodically(self):
+        owner = self.owner
+        self.archive()
+        while self.owner == owner:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def own_file(self):
+        pid, started = self.owner
+        return f'{pid}-{started}.json'
+
+    def flush(self):
+        if not settings.METRICS_ENABLED:
+            return
+        with self.lock:
+            if self.owner is None or self.owner[0] != os.getpid():
+                return
+            samples = dict(self.samples)
+            name = self.own_file()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        write_samples(os.path.join(settings.METRICS_DIR, name), samples)
+
+    def close(self):
+        """atexit: переносит значения процесса в архив."""
+        if self.owner is None or self.owner[0] != os.getpid():
+            return
+        self.flush()
+        self.archive(own=True)
+        self.owner = None
+
+    def is_dead(self, name, own):
+        """Файл процесса, который уже не будет его обновлять."""
+        pid, _, _ = name[:-len('.json')].partition('-')
+        if not pid.isdigit():
+            return False
+        if int(pid) == os.getpid():
+            # Прежний процесс с тем же pid или этот процесс при выходе.
+            return own or self.owner is None or name != self.own_file()
+        return not pid_alive(int(pid))
+
+    def archive(self, own=False):
+        """Сливает файлы завершившихся процессов в архив.
+
+        Возвращает сумму архива и файлов живых процессов.
+        """
+        directory = settings.METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        archived, live, dead = {}, {}, []
+        with archive_lock(directory):
+            archive_path = os.path.join(directory, ARCHIVE)
+            if os.path.exists(archive_path):
+                read_samples(archive_path, archived)
+            for name in os.listdir(directory):
+                if not name.endswith('.json') or name == ARCHIVE:
+                    continue
+                path = os.path.join(directory, name)
+                if self.is_dead(name, own):
+                    read_samples(path, archived)
+                    dead.append(path)
+                else:
+                    read_samples(path, live)
+            if dead:
+                write_samples(archive_path, archived)
+                for path in dead:
+                    os.remove(path)
+        for key, value in live.items():
+            archived[key] = archived.get(key, 0) + value
+        return archived
+
+    def collect(self):
+        """Сумма сэмплов всех процессов, живых и завершившихся."""
+        self.flush()
+        return self.archive()
+
+    def exposition(self):
+        samples = self.collect()
+        lines = []
+        for metric in sorted(self.metrics.values(), key=lambda m: m.name):
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            owned = [
+                item for item in samples.items() if metric.owns(item[0][0])
+            ]
+            for (sample, labels), value in sorted(owned, key=metric.sort_key):
+                lines.append(
+                    f'{sample}{format_labels(labels)} {format_value(value)}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class Metric:
+    type = 'untyped'
+    suffixes = ('',)
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def label_values(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name} ожидает метки {self.labelnames}, '
+                f'получены {tuple(labels)}'
+            )
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def owns(self, sample):
+        return sample in (self.name + suffix for suffix in self.suffixes)
+
+    def sort_key(self, item):
+        (sample, labels), _ = item
+        return sample, labels
+
+
+class Counter(Metric):
+    type = 'counter'
+    suffixes = ('_total',)
+
+    def inc(self, amount=1, **labels):
+        registry.add(f'{self.name}_total', self.label_values(labels), amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+    suffixes = ('_bucket', '_sum', '_count')
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        labels = self.label_values(labels)
+        for bound in self.buckets:
+            registry.add(
+                f'{self.name}_bucket',
+                labels + (('le', format_value(bound)),), int(value <= bound)
+            )
+        registry.add(f'{self.name}_sum', labels, value)
+        registry.add(f'{self.name}_count', labels, 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def sort_key(self, item):
+        (sample, labels), _ = item
+        bound = dict(labels).get('le')
+        return (
+            [pair for pair in labels if pair[0] != 'le'],
+            self.suffixes.index(sample[len(self.name):]),
+            float(bound.replace('+Inf', 'inf')) if bound else 0,
+        )
+
+
+api_requests = Histogram(
+    'foodgram_api_request_duration_seconds',
+    'Время обработки запроса к API.', ('view', 'action', 'status')
+)
+recipes_created = Counter(
+    'foodgram_recipes_created', 'Создано рецептов.'
+)
+user_recipe_changes = Counter(
+    'foodgram_user_recipe_changes',
+    'Добавления и удаления в избранном и списке покупок.',
+    ('kind', 'operation')
+)
+subscription_changes = Counter(
+    'foodgram_subscription_changes', 'Подписки и отписки.', ('operation',)
+)
+shopping_cart_downloads = Counter(
+    'foodgram_shopping_cart_downloads', 'Скачивания списка покупок.'
+)
+pdf_render = Histogram(
+    'foodgram_pdf_render_duration_seconds',
+    'Время генерации pdf со списком покупок.'
+)
+cache_requests = Counter(
+    'foodgram_cache_requests', 'Обращения к кэшам.', ('cache', 'result')
+)
+db_connections = Counter(
+    'foodgram_db_connections_opened',
+    'Открытые соединения с базой данных.', ('alias', 'vendor')
+)
+
+
+def count_db_connection(sender, connection, **kwargs):
+    """Обработчик сигнала connection_created."""
+    db_connections.inc(alias=connection.alias, vendor=connection.vendor)
+
+
+def metrics_view(request):
+    """Отдаёт метрики всех процессов в формате Prometheus."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(registry.exposition(), content_type=CONTENT_TYPE)
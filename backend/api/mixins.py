@@ -1,14 +1,100 @@
+import time
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+from api.metrics import api_requests
+from recipes.models import Cart, Favorite
 from users.models import Subscribe
 
+# Порядок множеств в context['user_state'], как у conditional.user_state.
+USER_STATE_MODELS = (Favorite, Cart, Subscribe)
+
 
 def check_request_return_boolean(obj, context, model_class):
-    """Проверяем факт запроса"""
+    """Проверяем факт запроса
+
+    Если вьюха уже посчитала избранное, корзину и подписки страницы,
+    они берутся из context['user_state'] без запроса к базе.
+    """
 
     request = context.get('request')
-    user_id = (
-        request.user.id if request and request.user.is_authenticated else None
-    )
+    if request is None or not request.user.is_authenticated:
+        return False
+    state = context.get('user_state')
+    if state is not None:
+        return obj.id in state[USER_STATE_MODELS.index(model_class)]
+    user_id = request.user.id
     filter_criteria = {
         'user_id': user_id, 'author': obj.id
     } if model_class == Subscribe else {'recipe': obj, 'user_id': user_id}
     return model_class.objects.filter(**filter_criteria).exists()
+
+
+class RequestMetricsMixin:
+    """Замер времени запросов вьюсета по action и статусу ответа."""
+
+    def dispatch(self, request, *args, **kwargs):
+        start_time = time.perf_counter()
+        response = super().dispatch(request, *args, **kwargs)
+        api_requests.observe(
+            time.perf_counter() - start_time, view=self.basename,
+            action=getattr(self, 'action', None) or request.method.lower(),
+            status=response.status_code
+        )
+        return response
+
+
+def query_param_set(request, name):
+    """Значения параметра вида ?name=a,b как множество или None."""
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def sparse_fields(request):
+    """Запрошенные поля и развёрнутые связи для GET-запроса.
+
+    Поля None означают полный ответ.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    return (
+        query_param_set(request, 'fields'),
+        query_param_set(request, 'expand') or set(),
+    )
+
+
+class SparseFieldsViewMixin:
+    """Передаёт ?fields= и ?expand= в контекст сериализатора."""
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'], context['expand'] = sparse_fields(self.request)
+        return context
+
+
+class SparseFieldsSerializerMixin:
+    """Оставляет только поля из context['fields'].
+
+    Связи из Meta.collapsed в выборочном режиме отдаются идентификаторами,
+    пока их нет в context['expand']. Вложенные сериализаторы не
+    фильтруются.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.context.get('fields')
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        if selected is None or parent is not None:
+            return fields
+        expand = self.context.get('expand', set())
+        collapsed = getattr(self.Meta, 'collapsed', {})
+        return {
+            name: collapsed[name]()
+            if name in collapsed and name not in expand else field
+            for name, field in fields.items() if name in selected
+        }
@@ -0,0 +1,122 @@
+"""Выборочное профилирование запросов через cProfile и tracemalloc.
+
+Профиль снимается, если запрос пришёл с заголовком X-Profile, значение
+которого есть в PROFILING_TOKENS, или попал в выборку с вероятностью
+PROFILING_SAMPLE_RATE. Результаты хранятся в PROFILING_DIR, старые
+снимки удаляются сверх PROFILING_MAX_CAPTURES.
+"""
+import cProfile
+import json
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+ALLOCATIONS_TOP = 20
+SLUG_RE = re.compile(r'[^\w]+')
+
+# cProfile и tracemalloc глобальны для процесса, профилируем по одному.
+profiling_lock = threading.Lock()
+
+
+def list_captures(directory):
+    """Метаданные снимков, от новых к старым."""
+    if not os.path.isdir(directory):
+        return []
+    captures = []
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name), encoding='utf-8') as file:
+                captures.append(json.load(file))
+    return sorted(captures, key=lambda capture: capture['id'], reverse=True)
+
+
+def prune_captures(directory, keep):
+    for capture in list_captures(directory)[keep:]:
+        for extension in ('.json', '.prof'):
+            path = os.path.join(directory, capture['id'] + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class ProfilingMiddleware:
+    """Снимает cProfile и топ аллокаций для отобранных запросов."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        token = request.META.get(PROFILE_HEADER)
+        if token:
+            return token in settings.PROFILING_TOKENS
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        if not profiling_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request)
+        finally:
+            profiling_lock.release()
+
+    def profile(self, request):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        profiler = cProfile.Profile()
+        start_time = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - start_time
+            allocations = tracemalloc.take_snapshot().compare_to(
+                before, 'lineno'
+            )[:ALLOCATIONS_TOP]
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+        capture_id = '{}-{}-{}'.format(
+            datetime.now().strftime('%Y%m%dT%H%M%S%f'), os.getpid(),
+            SLUG_RE.sub('-', request.path).strip('-')[:60]
+        )
+        self.save(capture_id, profiler, {
+            'id': capture_id,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'allocations': [{
+                'line': str(stat.traceback),
+                'size_kb': round(stat.size_diff / 1024, 1),
+                'count': stat.count_diff,
+            } for stat in allocations],
+        })
+        response['X-Profile-Id'] = capture_id
+        return response
+
+    @staticmethod
+    def save(capture_id, profiler, metadata):
+        directory = settings.PROFILING_DIR
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, f'{capture_id}.prof'))
+        with open(
+            os.path.join(directory, f'{capture_id}.json'), 'w',
+            encoding='utf-8'
+        ) as file:
+            json.dump(metadata, file, ensure_ascii=False, indent=2)
+        prune_captures(directory, settings.PROFILING_MAX_CAPTURES)
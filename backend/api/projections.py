@@ -0,0 +1,73 @@
+"""Сериализация простых списков через values() без ModelSerializer.
+
+Для сериализаторов, все поля которых читаются напрямую из колонок
+модели, строки берутся из queryset.values() и лишь файловые поля
+превращаются в URL. Ответ совпадает с тем, что отдал бы сериализатор,
+но без создания моделей и обхода полей DRF на каждую строку.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.response import Response
+
+PLAIN_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.IntegerField,
+    serializers.FloatField, serializers.ReadOnlyField,
+)
+
+
+@lru_cache(maxsize=None)
+def projection(serializer_class):
+    """Колонки и файловые поля сериализатора или None, если он сложнее."""
+    columns, files = [], []
+    for name, field in serializer_class().fields.items():
+        if field.source != name or field.write_only:
+            return None
+        if isinstance(field, serializers.FileField):
+            files.append(name)
+        elif not isinstance(field, PLAIN_FIELDS):
+            return None
+        columns.append(name)
+    return tuple(columns), tuple(files)
+
+
+def file_url(name, storage, request):
+    if not name:
+        return None
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def project(queryset, serializer_class, request=None):
+    """Данные serializer_class(queryset, many=True) через values().
+
+    Если быстрый путь выключен настройкой FAST_SERIALIZATION или
+    сериализатор не проецируется, работает обычный сериализатор.
+    """
+    spec = None
+    if settings.FAST_SERIALIZATION:
+        spec = projection(serializer_class)
+    if spec is None:
+        return serializer_class(
+            queryset, many=True, context={'request': request}
+        ).data
+    columns, files = spec
+    rows = list(queryset.values(*columns))
+    for name in files:
+        storage = queryset.model._meta.get_field(name).storage
+        for row in rows:
+            row[name] = file_url(row[name], storage, request)
+    return rows
+
+
+class ProjectedListMixin:
+    """list() через project() для вьюсетов без пагинации."""
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        return Response(project(
+            self.filter_queryset(self.get_queryset()),
+            self.get_serializer_class(), request
+        ))
@@ -0,0 +1,115 @@
+"""Теги и ингредиенты из памяти процесса для вложенных полей рецептов.
+
+Обе таблицы маленькие и меняются редко, поэтому процесс держит их целиком
+и перечитывает, когда меняется версия в ReferenceVersion. Версии сдвигают
+сигналы сохранения и удаления тегов и ингредиентов, а также команды
+массовой загрузки. Сериализатор рецептов сверяет версии одним запросом на
+ответ, а из связующих таблиц читает только id.
+"""
+import threading
+
+from django.conf import settings
+
+from api.metrics import cache_requests
+from recipes.models import (IngredientInRecipe, Ingredients, Recipes,
+                            ReferenceVersion, Tags)
+
+TAGS_KEY = 'reference_tags'
+INGREDIENTS_KEY = 'reference_ingredients'
+
+
+class ReferenceCache:
+    """Строки справочника по id, целиком перечитываются при смене версии."""
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.name = model._meta.model_name
+        self.fields = fields
+        self.lock = threading.Lock()
+        self.version = None
+        self.rows = {}
+
+    def load(self, ids=None):
+        queryset = self.model.objects.order_by()
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        return {row['id']: row for row in queryset.values(*self.fields)}
+
+    def snapshot(self, versions):
+        """Все строки справочника при версиях справочников versions."""
+        if not settings.REFERENCE_CACHE:
+            return self.load()
+        version = versions.get(self.name, 0)
+        with self.lock:
+            if version != self.version:
+                cache_requests.inc(cache='reference', result='miss')
+                # Версия прочитана раньше данных, поэтому более новые
+                # данные под старой версией лишь перечитаются ещё раз.
+                self.rows, self.version = self.load(), version
+            else:
+                cache_requests.inc(cache='reference', result='hit')
+            return self.rows
+
+    def get_many(self, ids, versions):
+        """Строки для ids при версиях справочников versions."""
+        if not settings.REFERENCE_CACHE:
+            return self.load(ids)
+        rows = self.snapshot(versions)
+        missing = [pk for pk in ids if pk not in rows]
+        if missing:
+            rows = {**rows, **self.load(missing)}
+        return rows
+
+
+tags = ReferenceCache(Tags, ('id', 'name', 'color', 'slug'))
+ingredients = ReferenceCache(Ingredients, ('id', 'name', 'measurement_unit'))
+
+
+def current_versions():
+    """Версии справочников одним запросом."""
+    if not settings.REFERENCE_CACHE:
+        return {}
+    return dict(ReferenceVersion.objects.values_list('name', 'version'))
+
+
+def load_relations(recipes):
+    """Id тегов и строки ингредиентов рецептов из связующих таблиц.
+
+    Порядок совпадает с prefetch_related: теги по id, ингредиенты от
+    новых строк к старым.
+    """
+    pending = {
+        recipe.pk: recipe for recipe in recipes
+        if not hasattr(recipe, 'tag_ids')
+    }
+    if not pending:
+        return
+    for recipe in pending.values():
+        recipe.tag_ids, recipe.ingredient_rows = [], []
+    for recipe_id, tag_id in Recipes.tags.through.objects.filter(
+        recipes_id__in=pending
+    ).order_by('tags_id').values_list('recipes_id', 'tags_id'):
+        pending[recipe_id].tag_ids.append(tag_id)
+    for recipe_id, ingredient_id, amount in IngredientInRecipe.objects.filter(
+        recipe_id__in=pending
+    ).order_by('-pk').values_list('recipe_id', 'ingredient_id', 'amount'):
+        pending[recipe_id].ingredient_rows.append((ingredient_id, amount))
+
+
+def prepare(recipes, context, with_rows=True):
+    """Связи рецептов и нужные им строки справочников в context.
+
+    Версии сверяются одним запросом на вызов, обычно один раз на ответ.
+    Без with_rows загружаются только id, для свёрнутых полей.
+    """
+    load_relations(recipes)
+    if not with_rows:
+        return
+    versions = current_versions()
+    context[TAGS_KEY] = tags.get_many(
+        {pk for recipe in recipes for pk in recipe.tag_ids}, versions
+    )
+    context[INGREDIENTS_KEY] = ingredients.get_many(
+        {pk for recipe in recipes for pk, _ in recipe.ingredient_rows},
+        versions
+    )
@@ -0,0 +1,31 @@
+"""JSON-рендерер на orjson с откатом на стандартный JSONRenderer.
+
+orjson сериализует ответ в несколько раз быстрее модуля json. Если
+библиотека не установлена, выключена настройкой FAST_JSON или клиент
+запросил форматирование с отступами, работает обычный рендерер DRF.
+"""
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or not settings.FAST_JSON or data is None
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        # Типы, которых orjson не знает (Decimal, ленивые строки), отдаём
+        # кодировщику DRF.
+        return orjson.dumps(data, default=encoder.default)
@@ -1,17 +1,22 @@
 from django.core import validators
 from django.contrib.auth.hashers import make_password
-from django.db import transaction
+from django.db import IntegrityError, models, transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
+from api import reference
 from api.const import MAX_AMOUNT, MAX_COOKING_TIME, MIN_AMOUNT
-from api.mixins import check_request_return_boolean
+from api.mixins import (SparseFieldsSerializerMixin,
+                        check_request_return_boolean)
+from api.projections import project
 from recipes.models import (Cart, Favorite, IngredientInRecipe, Ingredients,
                             Recipes, Tags)
 from users.models import Subscribe, User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsSerializerMixin,
+                     serializers.ModelSerializer):
     """Сериализатор на модель User"""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -41,10 +46,32 @@ class ShortSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class SubscribePostSerializer(serializers.ModelSerializer):
+class UniqueEntrySerializer(serializers.ModelSerializer):
+    """Базовый сериализатор записи с уникальным ограничением в БД.
+
+    Наличие записи не проверяется отдельным запросом: вставка выполняется
+    одним INSERT внутри savepoint, а нарушение UniqueConstraint
+    превращается в ответ 400 с сообщением unique_error_message.
+    """
+
+    unique_error_message = 'Запись уже существует.'
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [self.unique_error_message]
+            })
+
+
+class SubscribePostSerializer(UniqueEntrySerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
     author = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
 
+    unique_error_message = 'Подписка уже существует'
+
     class Meta:
         model = Subscribe
         fields = ('user', 'author')
@@ -54,14 +81,12 @@ class SubscribePostSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'На самого себя нельзя подписаться'
             )
-        if data['user'].filter(author=data['author']).exists():
-            raise serializers.ValidationError(
-                'Подписка уже существует'
-            )
         return data
 
-    def to_representation(self, author):
-        return super().to_representation(author)
+    def to_representation(self, instance):
+        return SubscribeGetSerializer(
+            instance.author, context=self.context
+        ).data
 
 
 class SubscribeGetSerializer(UserSerializer):
@@ -74,7 +99,7 @@ class SubscribeGetSerializer(UserSerializer):
                   'is_subscribed', 'recipes', 'recipes_count')
 
     def get_recipes(self, obj):
-        queryset = Recipes.objects.filter(author__in=obj.following.all())
+        queryset = obj.recipe_author.all()
         recipes_limit = self.context.get('request').GET.get('recipes_limit')
         if recipes_limit:
             try:
@@ -82,7 +107,7 @@ class SubscribeGetSerializer(UserSerializer):
                 queryset = queryset[:limit]
             except ValueError:
                 pass
-        return ShortSerializer(queryset, many=True).data
+        return project(queryset, ShortSerializer)
 
     def get_recipes_count(self, obj):
         return obj.recipe_author.count()
@@ -104,18 +129,40 @@ class IngredientsSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class IngredientInRecipeSerializer(serializers.ModelSerializer):
-    """Сериализатор связанной модели ингредиентов и рецептов"""
+class ReferenceTagsField(serializers.Field):
+    """Теги рецепта из кэша справочников, в свёрнутом виде - id."""
 
-    id = serializers.ReadOnlyField(source='ingredient.id')
-    name = serializers.ReadOnlyField(source='ingredient.name')
-    measurement_unit = serializers.ReadOnlyField(
-        source='ingredient.measurement_unit'
-    )
+    key = reference.TAGS_KEY
 
-    class Meta:
-        model = IngredientInRecipe
-        fields = ('id', 'name', 'measurement_unit', 'amount')
+    def __init__(self, collapsed=False, **kwargs):
+        self.collapsed = collapsed
+        super().__init__(source='*', read_only=True, **kwargs)
+
+    def rows(self, recipe):
+        if self.key not in self.context:
+            reference.prepare([recipe], self.context)
+        return self.context[self.key]
+
+    def to_representation(self, recipe):
+        if self.collapsed:
+            return list(recipe.tag_ids)
+        rows = self.rows(recipe)
+        return [dict(rows[pk]) for pk in recipe.tag_ids if pk in rows]
+
+
+class ReferenceIngredientsField(ReferenceTagsField):
+    """Ингредиенты рецепта с количеством из кэша справочников."""
+
+    key = reference.INGREDIENTS_KEY
+
+    def to_representation(self, recipe):
+        if self.collapsed:
+            return [pk for pk, _ in recipe.ingredient_rows]
+        rows = self.rows(recipe)
+        return [
+            {**rows[pk], 'amount': amount}
+            for pk, amount in recipe.ingredient_rows if pk in rows
+        ]
 
 
 class SimpleIngredientInRecipeSerializer(serializers.ModelSerializer):
@@ -134,7 +181,9 @@ class SimpleIngredientInRecipeSerializer(serializers.ModelSerializer):
 class RecipesPostSerializer(serializers.ModelSerializer):
     """Сериализатор для создания, обновления и удаления рецептов (POST)."""
 
-    tags = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    tags = serializers.PrimaryKeyRelatedField(
+        many=True, queryset=Tags.objects.all()
+    )
     author = UserSerializer(read_only=True)
     ingredients = SimpleIngredientInRecipeSerializer(many=True)
     image = Base64ImageField()
@@ -147,8 +196,8 @@ class RecipesPostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipes
         fields = (
-            'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'id', 'tags', 'author', 'ingredients', 'name', 'image', 'text',
+            'cooking_time'
         )
 
     def validate(self, data):
@@ -171,6 +220,7 @@ class RecipesPostSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {'tags': 'Теги в рецепте не должны повторяться'}
             )
+        return data
 
     def validate_image(self, value):
         if not value:
@@ -182,7 +232,7 @@ class RecipesPostSerializer(serializers.ModelSerializer):
         ingredient_objects = []
         for ingredient_item in ingredients:
             ingredient = IngredientInRecipe(
-                ingredient_id=ingredient_item['id'],
+                ingredient=ingredient_item['id'],
                 recipe=recipe,
                 amount=ingredient_item['amount']
             )
@@ -210,15 +260,32 @@ class RecipesPostSerializer(serializers.ModelSerializer):
         recipe.tags.set(tags)
         return super().update(recipe, validated_data)
 
+    def to_representation(self, instance):
+        return RecipesGetSerializer(instance, context=self.context).data
+
+
+class RecipesListSerializer(serializers.ListSerializer):
+    """Загружает связи всей страницы рецептов разом."""
 
-class RecipesGetSerializer(serializers.ModelSerializer):
-    """Сериализатор (GET запросы)."""
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        self.child.prepare_reference(recipes)
+        return super().to_representation(recipes)
+
+
+class RecipesGetSerializer(SparseFieldsSerializerMixin,
+                           serializers.ModelSerializer):
+    """Сериализатор (GET запросы).
 
-    tags = TagsSerializer(many=True, read_only=True)
+    Теги и ингредиенты берутся из кэша справочников api.reference, из
+    базы читаются только id из связующих таблиц.
+    """
+
+    tags = ReferenceTagsField()
     author = UserSerializer(read_only=True)
-    ingredients = IngredientInRecipeSerializer(
-        source='ingredientinrecipe_set', many=True, read_only=True
-    )
+    ingredients = ReferenceIngredientsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -226,38 +293,49 @@ class RecipesGetSerializer(serializers.ModelSerializer):
         model = Recipes
         fields = (
             'id', 'tags', 'author', 'ingredients', 'name',
-            'image', 'text', 'cooking_time', 'is_faforited',
-            'is_in_shoping_cart'
+            'image', 'text', 'cooking_time', 'is_favorited',
+            'is_in_shopping_cart'
         )
+        list_serializer_class = RecipesListSerializer
+        collapsed = {
+            'tags': lambda: ReferenceTagsField(collapsed=True),
+            'author': lambda: serializers.ReadOnlyField(source='author_id'),
+            'ingredients': lambda: ReferenceIngredientsField(collapsed=True),
+        }
+
+    def prepare_reference(self, recipes):
+        fields = [
+            field for field in self.fields.values()
+            if isinstance(field, ReferenceTagsField)
+        ]
+        if fields:
+            reference.prepare(recipes, self.context, with_rows=any(
+                not field.collapsed for field in fields
+            ))
 
+    def to_representation(self, instance):
+        if not hasattr(instance, 'tag_ids'):
+            self.prepare_reference([instance])
+        return super().to_representation(instance)
+
+    def get_is_favorited(self, obj):
+        return check_request_return_boolean(obj, self.context, Favorite)
+
+    def get_is_in_shopping_cart(self, obj):
+        return check_request_return_boolean(obj, self.context, Cart)
+
+
+class FavoriteSerializer(UniqueEntrySerializer):
+    unique_error_message = 'Этот рецепт уже добавлен в избранное.'
 
-class FavoriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favorite
         fields = ['user', 'recipe']
 
-    def validate(self, data):
-        user = data['user']
-        recipe = data['recipe']
-        if Favorite.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                'Этот рецепт уже добавлен в избранное.'
-            )
-
-        return data
-
 
 class CartSerializer(FavoriteSerializer):
+    unique_error_message = 'Этот рецепт уже в корзине пользователя.'
+
     class Meta(FavoriteSerializer.Meta):
         model = Cart
         fields = ['user', 'recipe']
-
-    def validate(self, data):
-        user = data['user']
-        recipe = data['recipe']
-        if self.Meta.model.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-
-                'Этот рецепт уже в корзине пользователя.'
-            )
-        return data
@@ -0,0 +1,227 @@
+"""Список покупок в pdf: кэш готовых файлов и фоновая генерация.
+
+Готовый файл хранится в SHOPPING_LIST_DIR под именем sha256 от
+агрегированного содержимого корзины, формата и версии шаблона с
+префиксом id пользователя, поэтому повторное скачивание неизменившейся
+корзины отдаётся сразу, хэш служит ETag, а чужие файлы и задачи
+недоступны. Кэш вытесняет давно не запрошенные файлы, когда их больше
+SHOPPING_LIST_MAX_FILES или суммарный размер выше
+SHOPPING_LIST_MAX_BYTES. При SHOPPING_LIST_ASYNC=true
+отсутствующий файл рендерится в пуле потоков процесса, а клиент получает
+202 и адрес для опроса. Состояние задачи хранится рядом с файлами, так
+что опрашивать можно любой процесс gunicorn.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.db.models import Sum
+from django.http import FileResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
+
+from api.metrics import cache_requests, pdf_render
+from api.utils import PDF_TEMPLATE_VERSION, render_pdf
+from recipes.models import IngredientInRecipe
+
+FORMAT = 'pdf'
+FILENAME = 'shopping_list.pdf'
+CONTENT_TYPE = 'application/pdf'
+RETRY_AFTER = 1
+
+READY = 'ready'
+PENDING = 'pending'
+FAILED = 'failed'
+
+executor_lock = threading.Lock()
+executor = None
+
+
+def cart_ingredients(user):
+    """Ингредиенты корзины пользователя, суммированные по названию."""
+    return list(IngredientInRecipe.objects.filter(
+        recipe__cart__user=user
+    ).values_list(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(Sum('amount')).order_by('ingredient__name'))
+
+
+def cart_key(ingredients):
+    return hashlib.sha256(json.dumps({
+        'format': FORMAT,
+        'version': PDF_TEMPLATE_VERSION,
+        'rows': [list(row) for row in ingredients],
+    }, ensure_ascii=False, sort_keys=True).encode()).hexdigest()
+
+
+def document_name(user, key):
+    """Имя файла списка покупок: ключ в пространстве пользователя."""
+    return f'{user.pk}-{key}'
+
+
+def file_path(name, extension):
+    return os.path.join(settings.SHOPPING_LIST_DIR, f'{name}.{extension}')
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def job_status(name):
+    if os.path.exists(file_path(name, FORMAT)):
+        return READY
+    try:
+        started = os.path.getmtime(file_path(name, 'pending'))
+    except FileNotFoundError:
+        pass
+    else:
+        # Задача, не успевшая за таймаут, считается потерянной вместе
+        # с процессом, который её выполнял.
+        if time.time() - started < settings.SHOPPING_LIST_JOB_TIMEOUT:
+            return PENDING
+    if os.path.exists(file_path(name, 'error')):
+        return FAILED
+    return None
+
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                settings.SHOPPING_LIST_WORKERS,
+                thread_name_prefix='shopping-list'
+            )
+    return executor
+
+
+def write_file(path, data):
+    with open(f'{path}.tmp', 'wb') as file:
+        file.write(data)
+    os.replace(f'{path}.tmp', path)
+
+
+def prune_documents(directory, max_files, max_bytes, marker_ttl):
+    """Удаляет давно не запрошенные файлы сверх лимитов кэша.
+
+    При каждом попадании mtime файла обновляется, так что порядок по
+    mtime совпадает с порядком LRU. Метки .error и .pending старше
+    marker_ttl удаляются: ошибка к этому времени уже отдана опросу, а
+    задача считается потерянной.
+    """
+    documents = []
+    expired = time.time() - marker_ttl
+    for entry in os.scandir(directory):
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if entry.name.endswith(f'.{FORMAT}'):
+            documents.append((stat.st_mtime, stat.st_size, entry.path))
+        elif (entry.name.endswith(('.error', '.pending'))
+                and stat.st_mtime < expired):
+            remove_file(entry.path)
+    documents.sort(reverse=True)
+    total = 0
+    for number, (_, size, path) in enumerate(documents):
+        total += size
+        if number >= max_files or total > max_bytes:
+            remove_file(path)
+
+
+def render_document(name, ingredients):
+    """Рендерит pdf и сохраняет его в кэш."""
+    try:
+        with pdf_render.time():
+            data = render_pdf(ingredients)
+        write_file(file_path(name, FORMAT), data)
+        remove_file(file_path(name, 'error'))
+    except Exception as error:
+        write_file(file_path(name, 'error'), str(error).encode())
+        raise
+    finally:
+        remove_file(file_path(name, 'pending'))
+        prune_documents(
+            settings.SHOPPING_LIST_DIR, settings.SHOPPING_LIST_MAX_FILES,
+            settings.SHOPPING_LIST_MAX_BYTES,
+            settings.SHOPPING_LIST_JOB_TIMEOUT
+        )
+    return data
+
+
+def enqueue(name, ingredients):
+    """Ставит рендер в очередь, если такой же ещё не выполняется.
+
+    Повторная попытка после ошибки сбрасывает метку .error.
+    """
+    if job_status(name) == PENDING:
+        return
+    for extension in ('pending', 'error'):
+        remove_file(file_path(name, extension))
+    try:
+        os.close(os.open(
+            file_path(name, 'pending'), os.O_CREAT | os.O_EXCL | os.O_WRONLY
+        ))
+    except FileExistsError:
+        return
+    get_executor().submit(render_document, name, ingredients)
+
+
+def with_etag(response, key):
+    response['ETag'] = quote_etag(key)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def document_response(request, key):
+    """Файл пользователя из кэша или 304, если у клиента та же версия."""
+    if quote_etag(key) in parse_etags(
+        request.META.get('HTTP_IF_NONE_MATCH', '')
+    ):
+        return with_etag(HttpResponseNotModified(), key)
+    path = file_path(document_name(request.user, key), FORMAT)
+    try:
+        os.utime(path)
+        file = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    return with_etag(FileResponse(
+        file, filename=FILENAME, content_type=CONTENT_TYPE
+    ), key)
+
+
+def job_response(request, key):
+    url = request.build_absolute_uri(
+        reverse('recipes-shopping-list-job', kwargs={'key': key})
+    )
+    response = JsonResponse({'status': PENDING, 'url': url}, status=202)
+    response['Location'] = url
+    response['Retry-After'] = RETRY_AFTER
+    return response
+
+
+def shopping_list_response(request, ingredients):
+    """Готовый файл из кэша, задача в фоне или рендер в запросе."""
+    os.makedirs(settings.SHOPPING_LIST_DIR, exist_ok=True)
+    key = cart_key(ingredients)
+    response = document_response(request, key)
+    if response is not None:
+        cache_requests.inc(cache='shopping_list', result='hit')
+        return response
+    cache_requests.inc(cache='shopping_list', result='miss')
+    name = document_name(request.user, key)
+    if settings.SHOPPING_LIST_ASYNC:
+        enqueue(name, ingredients)
+        return job_response(request, key)
+    return with_etag(FileResponse(
+        BytesIO(render_document(name, ingredients)), filename=FILENAME,
+        content_type=CONTENT_TYPE
+    ), key)
@@ -0,0 +1,94 @@
+"""Синхронизация избранного, корзины и подписок по изменениям.
+
+Добавления видны по полю created у самих записей, удаления пишутся в
+Tombstone. Клиент присылает курсор из прошлого ответа (?since=) и
+получает только изменения после него. Время created назначается до
+коммита, поэтому окно запроса сдвинуто назад на SYNC_CURSOR_OVERLAP
+секунд: повторно присланные изменения безопасны, так как клиент хранит
+множества id.
+Если курсор старше SYNC_TOMBSTONE_DAYS, удаления могли быть уже
+вычищены, и клиент получает полный список с флагом reset.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from recipes.models import Cart, Favorite, Tombstone
+from users.models import Subscribe
+
+# Ключ ответа, модель, поле с id рецепта или автора.
+SYNC_KINDS = (
+    ('favorites', Favorite, 'recipe_id'),
+    ('shopping_cart', Cart, 'recipe_id'),
+    ('subscriptions', Subscribe, 'author_id'),
+)
+FIELDS = {model: field for _, model, field in SYNC_KINDS}
+
+
+def delete_entries(queryset):
+    """Удаляет записи queryset, оставляя Tombstone для синхронизации."""
+    model = queryset.model
+    with transaction.atomic():
+        Tombstone.objects.bulk_create([
+            Tombstone(
+                user_id=user_id, kind=model._meta.model_name,
+                object_id=object_id
+            ) for user_id, object_id in queryset.values_list(
+                'user_id', FIELDS[model]
+            )
+        ])
+        return queryset.delete()
+
+
+def make_cursor(moment):
+    return str(int(moment.timestamp() * 1000000))
+
+
+def parse_cursor(value):
+    """Время из курсора make_cursor: микросекунды с начала эпохи."""
+    try:
+        return datetime.fromtimestamp(int(value) / 1000000, tz=timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ValidationError({'since': 'Некорректный курсор.'})
+
+
+def changes(user, since=None):
+    """Добавления и удаления пользователя после курсора since."""
+    now = timezone.now()
+    reset = since is None or since < now - timedelta(
+        days=settings.SYNC_TOMBSTONE_DAYS
+    )
+    start = None if reset else since - timedelta(
+        seconds=settings.SYNC_CURSOR_OVERLAP
+    )
+    removed = {}
+    if not reset:
+        for kind, object_id in Tombstone.objects.filter(
+            user=user, deleted__gt=start
+        ).values_list('kind', 'object_id'):
+            removed.setdefault(kind, set()).add(object_id)
+    data = {'cursor': make_cursor(now), 'reset': reset}
+    for key, model, field in SYNC_KINDS:
+        queryset = model.objects.filter(user=user)
+        if start is not None:
+            queryset = queryset.filter(created__gt=start)
+        added = list(queryset.order_by(field).values_list(field, flat=True))
+        # Удалённая и снова добавленная запись есть среди добавлений.
+        present = set(added)
+        data[key] = {
+            'added': added,
+            'removed': sorted(
+                removed.get(model._meta.model_name, set()) - present
+            ),
+        }
+    return data
+
+
+def prune_tombstones(days):
+    """Удаляет записи об удалениях старше days дней."""
+    return Tombstone.objects.filter(
+        deleted__lt=timezone.now() - timedelta(days=days)
+    ).delete()[0]
@@ -0,0 +1,501 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api import async_views
+from api.authentication import (VERSION_KEY, CachedTokenAuthentication,
+                                token_cache)
+from api.shopping_list import prune_documents
+from recipes.models import (Cart, Favorite, IngredientInRecipe, Ingredients,
+                            Recipes, Tags)
+from recipes.signals import bump_reference_versions
+from recipes.storage import ContentAddressedStorage
+from users.models import Subscribe, User
+
+THREADS = 8
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=='
+)
+
+
+class ConcurrentEntriesTest(TransactionTestCase):
+    """Одновременные повторы добавления: одна запись, остальные - 400."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', password='password'
+        )
+        self.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='password'
+        )
+        self.recipe = Recipes.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            image='recipes/images/recipe.png', cooking_time=10
+        )
+        self.token = Token.objects.create(user=self.user).key
+
+    def post_concurrently(self, url):
+        barrier = threading.Barrier(THREADS)
+
+        def post(_):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+            barrier.wait()
+            try:
+                return client.post(url).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(THREADS) as executor:
+            return sorted(executor.map(post, range(THREADS)))
+
+    def assert_single_entry(self, url, model, **lookup):
+        statuses = self.post_concurrently(url)
+        self.assertEqual(statuses, [201] + [400] * (THREADS - 1))
+        self.assertEqual(model.objects.filter(**lookup).count(), 1)
+
+    def test_favorite(self):
+        self.assert_single_entry(
+            reverse('recipes-add-to-favorite', args=(self.recipe.pk,)),
+            Favorite, user=self.user, recipe=self.recipe
+        )
+
+    def test_shopping_cart(self):
+        self.assert_single_entry(
+            reverse('recipes-add-to-shopping-cart', args=(self.recipe.pk,)),
+            Cart, user=self.user, recipe=self.recipe
+        )
+
+    def test_subscribe(self):
+        self.assert_single_entry(
+            reverse('users-subscribe', args=(self.author.pk,)),
+            Subscribe, user=self.user, author=self.author
+        )
+
+
+class RecipeWriteTest(TestCase):
+    """Создание и изменение рецепта через RecipesPostSerializer."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='password'
+        )
+        self.tags = [
+            Tags.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'zavtrak'), ('Обед', '#49B64E', 'obed')
+            )
+        ]
+        self.ingredient = Ingredients.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def payload(self, **data):
+        return {
+            'tags': [self.tags[0].pk],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 10}],
+            'name': 'Рецепт', 'image': IMAGE, 'text': 'Описание',
+            'cooking_time': 10, **data,
+        }
+
+    def test_create_and_update(self):
+        response = self.client.post(
+            reverse('recipes-list'), self.payload(), format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['tags'][0]['slug'], 'zavtrak')
+        self.assertEqual(response.data['ingredients'][0]['amount'], 10)
+        recipe = Recipes.objects.get(pk=response.data['id'])
+        response = self.client.patch(
+            reverse('recipes-detail', args=(recipe.pk,)),
+            self.payload(tags=[tag.pk for tag in self.tags], name='Новый'),
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [tag['id'] for tag in response.data['tags']],
+            [tag.pk for tag in self.tags]
+        )
+        self.assertEqual(
+            Recipes.objects.get(pk=recipe.pk).name, 'Новый'
+        )
+
+
+@override_settings(
+    TOKEN_CACHE_ALIAS='tokens',
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        },
+        'tokens': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tokens',
+        },
+    },
+)
+class CachedTokenAuthenticationTest(TestCase):
+    """Кэш токенов: свежий User на запрос и отзыв во всех процессах."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', password='password'
+        )
+        self.key = Token.objects.create(user=self.user).key
+        self.authentication = CachedTokenAuthentication()
+
+    def test_fresh_user_per_request(self):
+        first, _ = self.authentication.authenticate_credentials(self.key)
+        first.leaked = True
+        with self.assertNumQueries(0):
+            second, _ = self.authentication.authenticate_credentials(
+                self.key
+            )
+        self.assertIsNot(first, second)
+        self.assertFalse(hasattr(second, 'leaked'))
+        self.assertEqual(second.pk, self.user.pk)
+
+    def test_version_bump_from_other_process(self):
+        self.authentication.authenticate_credentials(self.key)
+        # Другой воркер деактивировал пользователя: локальный кэш этого
+        # процесса не тронут, сдвинута только версия в общем кэше.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        caches['tokens'].incr(VERSION_KEY.format(self.user.pk))
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.key)
+
+    def test_token_deleted(self):
+        self.authentication.authenticate_credentials(self.key)
+        Token.objects.filter(key=self.key).delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.key)
+
+
+class ReferenceChangeTest(TestCase):
+    """Правки справочников видны в карточках и ответах рецептов."""
+
+    def setUp(self):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            password='password'
+        )
+        self.tags = [
+            Tags.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'zavtrak'), ('Обед', '#49B64E', 'obed')
+            )
+        ]
+        self.recipe = Recipes.objects.create(
+            author=author, name='Рецепт', text='Описание',
+            image='recipes/images/recipe.png', cooking_time=10
+        )
+        self.recipe.tags.set(self.tags)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_tag_delete(self):
+        list_url = reverse('recipes-list')
+        detail_url = reverse('recipes-detail', args=(self.recipe.pk,))
+        before = self.get(list_url), self.get(detail_url)
+        self.tags[1].delete()
+        after = self.get(list_url), self.get(detail_url)
+        for old, new in zip(before, after):
+            self.assertNotEqual(old['ETag'], new['ETag'])
+        self.assertEqual(
+            [tag['slug'] for tag in after[0].json()['results'][0]['tags']],
+            ['zavtrak']
+        )
+        self.assertEqual(
+            [tag['slug'] for tag in after[1].json()['tags']], ['zavtrak']
+        )
+
+    def test_bulk_tag_rename(self):
+        list_url = reverse('recipes-list')
+        self.get(list_url)
+        # Массовая загрузка обходит сигналы и сдвигает только версию.
+        Tags.objects.filter(pk=self.tags[0].pk).update(name='Ужин')
+        bump_reference_versions('tags')
+        self.assertEqual(
+            [tag['name'] for tag in self.get(
+                list_url
+            ).json()['results'][0]['tags']],
+            ['Ужин', 'Обед']
+        )
+
+
+class AsyncViewsTest(TestCase):
+    """Асинхронные обёртки ведут себя как синхронные DRF-вьюхи."""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.tag = Tags.objects.create(
+            name='Завтрак', color='#E26C2D', slug='zavtrak'
+        )
+        self.recipe = Recipes.objects.create(
+            author=User.objects.create_user(
+                email='author@example.com', username='author',
+                password='password'
+            ),
+            name='Рецепт', text='Описание',
+            image='recipes/images/recipe.png', cooking_time=10
+        )
+
+    def call(self, view, request, **kwargs):
+        response = async_to_sync(view)(request, **kwargs)
+        return response.render()
+
+    def test_same_response_as_sync(self):
+        response = self.call(async_views.tags_list, self.factory.get('/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.content, self.client.get(reverse('tags-list')).content
+        )
+
+    def test_permissions(self):
+        for view, request, kwargs in (
+            (async_views.subscriptions, self.factory.get('/'), {}),
+            (async_views.download_shopping_cart, self.factory.get('/'), {}),
+            (
+                async_views.recipe_detail, self.factory.delete('/'),
+                {'pk': self.recipe.pk}
+            ),
+        ):
+            response = self.call(view, request, **kwargs)
+            self.assertEqual(response.status_code, 401)
+            self.assertIn(b'detail', response.content)
+
+
+class ShoppingListJobTest(TestCase):
+    """Задачи списка покупок привязаны к пользователю и не копятся."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        settings_override = override_settings(
+            SHOPPING_LIST_ASYNC=True, SHOPPING_LIST_DIR=directory
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.directory = directory
+        self.user, self.other = (
+            User.objects.create_user(
+                email=f'{name}@example.com', username=name,
+                password='password'
+            ) for name in ('user', 'other')
+        )
+        recipe = Recipes.objects.create(
+            author=self.user, name='Рецепт', text='Описание',
+            image='recipes/images/recipe.png', cooking_time=10
+        )
+        IngredientInRecipe.objects.create(
+            recipe=recipe, amount=10, ingredient=Ingredients.objects.create(
+                name='Соль', measurement_unit='г'
+            )
+        )
+        Cart.objects.create(user=self.user, recipe=recipe)
+
+    def test_job_of_other_user(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('recipes-download-shopping-cart'))
+        self.assertEqual(response.status_code, 202)
+        url = response['Location']
+        # Рендер в фоне: дожидаемся его, чтобы поток не писал в каталог
+        # следующего теста.
+        for _ in range(100):
+            response = self.client.get(url)
+            if response.status_code != 202:
+                break
+            time.sleep(0.1)
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_prune_markers(self):
+        stale = time.time() - 2 * settings.SHOPPING_LIST_JOB_TIMEOUT
+        for name in ('1-stale.error', '1-stale.pending', '1-fresh.error'):
+            path = os.path.join(self.directory, name)
+            open(path, 'w').close()
+            if 'stale' in name:
+                os.utime(path, (stale, stale))
+        prune_documents(
+            self.directory, 10, 10 ** 6, settings.SHOPPING_LIST_JOB_TIMEOUT
+        )
+        self.assertEqual(os.listdir(self.directory), ['1-fresh.error'])
+
+
+class UserStateQueriesTest(TestCase):
+    """Флаги рецептов и подписок не дают запросов на каждую строку."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', password='password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_recipes(self, count):
+        author = User.objects.create_user(
+            email=f'author{count}@example.com', username=f'author{count}',
+            password='password'
+        )
+        Subscribe.objects.create(user=self.user, author=author)
+        for number in range(count):
+            recipe = Recipes.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                image='recipes/images/recipe.png', cooking_time=10
+            )
+            Favorite.objects.create(user=self.user, recipe=recipe)
+
+    def get_list(self):
+        response = self.client.get(reverse('recipes-list'), {
+            'fields': 'id,author,is_favorited,is_in_shopping_cart',
+            'expand': 'author',
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_sparse_list(self):
+        self.add_recipes(1)
+        with CaptureQueriesContext(connection) as queries:
+            self.get_list()
+        self.add_recipes(3)
+        with self.assertNumQueries(len(queries)):
+            results = self.get_list()
+        self.assertEqual(len(results), 4)
+        for recipe in results:
+            self.assertTrue(recipe['is_favorited'])
+            self.assertFalse(recipe['is_in_shopping_cart'])
+            self.assertTrue(recipe['author']['is_subscribed'])
+
+
+class CatalogueRestoreTest(TestCase):
+    """Выгрузка без email и восстановление рецептов поверх базы."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.path = os.path.join(directory, 'catalogue.jsonl')
+        self.recipe = Recipes.objects.create(
+            author=User.objects.create_user(
+                email='author@example.com', username='author',
+                password='password'
+            ),
+            name='Рецепт', text='Описание',
+            image='recipes/images/recipe.png', cooking_time=10
+        )
+        self.recipe.tags.add(Tags.objects.create(
+            name='Завтрак', color='#E26C2D', slug='zavtrak'
+        ))
+        for number in range(5):
+            IngredientInRecipe.objects.create(
+                recipe=self.recipe, amount=10,
+                ingredient=Ingredients.objects.create(
+                    name=f'Соль {number}', measurement_unit='г'
+                )
+            )
+
+    def test_round_trip(self):
+        call_command('export_catalogue', self.path, stderr=StringIO())
+        with open(self.path, encoding='utf-8') as file:
+            self.assertNotIn('author@example.com', file.read())
+        with CaptureQueriesContext(connection) as queries:
+            call_command(
+                'restore_catalogue', self.path, '--force', stdout=StringIO()
+            )
+        touches = [
+            query for query in queries
+            if query['sql'].startswith('UPDATE "recipes_recipes"')
+        ]
+        # upsert рецептов и по одному касанию на пачку связей.
+        self.assertLessEqual(len(touches), 4)
+        self.assertEqual(
+            IngredientInRecipe.objects.filter(recipe=self.recipe).count(), 5
+        )
+        self.assertEqual(self.recipe.tags.count(), 1)
+        self.assertEqual(
+            Recipes.objects.get(pk=self.recipe.pk).author.email,
+            'author@example.com'
+        )
+
+
+class ContentAddressedStorageTest(TestCase):
+    """Сохранение картинки, удалённой сборкой мусора после exists()."""
+
+    def test_file_removed_after_exists(self):
+        storage = ContentAddressedStorage(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, storage.location, True)
+        with mock.patch.object(storage, 'exists', return_value=True):
+            name = storage.save('image.png', ContentFile(b'image'))
+        with storage.open(name) as file:
+            self.assertEqual(file.read(), b'image')
+
+
+class LoadCsvDataTest(TestCase):
+    """Пробный прогон загрузки справочников."""
+
+    def test_dry_run_without_queries(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        for name, content in (
+            ('tags.csv', 'Завтрак,#E26C2D,zavtrak\n'),
+            ('ingredients.csv', 'соль,г\nвода,\n'),
+        ):
+            with open(os.path.join(directory, name), 'w') as file:
+                file.write(content)
+        with self.assertNumQueries(0):
+            call_command(
+                'load_csv_data', '--dry-run', path=directory,
+                stdout=StringIO()
+            )
+
+
+class AdminChangelistTest(TestCase):
+    """Списки всех моделей админки открываются, в том числе с поиском."""
+
+    def test_changelists(self):
+        self.client.force_login(User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='password'
+        ))
+        for model in admin.site._registry:
+            url = reverse(
+                f'admin:{model._meta.app_label}_'
+                f'{model._meta.model_name}_changelist'
+            )
+            for params in ({}, {'q': 'соль'}, {'q': '1'}):
+                with self.subTest(model=model.__name__, **params):
+                    response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, 200)
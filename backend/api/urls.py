@@ -1,17 +1,33 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (IngredientsViewSet, RecipesViewSet, TagsViewSet,
-                       UserViewSet)
+from api import async_views
+from api.views import (BootstrapViewSet, IngredientsViewSet, RecipesViewSet,
+                       SyncViewSet, TagsViewSet, UserViewSet)
 
 router_v1 = DefaultRouter()
 router_v1.register(r'tags', TagsViewSet, basename='tags')
 router_v1.register(r'ingredients', IngredientsViewSet, basename='ingredients')
 router_v1.register(r'recipes', RecipesViewSet, basename='recipes')
 router_v1.register(r'users', UserViewSet, basename='users')
+router_v1.register(r'bootstrap', BootstrapViewSet, basename='bootstrap')
+router_v1.register(r'sync', SyncViewSet, basename='sync')
+
+async_urlpatterns = [
+    path('tags/', async_views.tags_list),
+    path('ingredients/', async_views.ingredients_list),
+    path(
+        'recipes/download_shopping_cart/',
+        async_views.download_shopping_cart
+    ),
+    path('recipes/<int:pk>/', async_views.recipe_detail),
+    path('users/subscriptions/', async_views.subscriptions),
+]
 
 urlpatterns = [
+    *(async_urlpatterns if settings.ASYNC_VIEWS else []),
     path('', include(router_v1.urls)),
-    path(r'^auth/', include('djoser.urls')),
-    path(r'^auth/', include('djoser.urls.authtoken')),
+    path('auth/', include('djoser.urls')),
+    path('auth/', include('djoser.urls.authtoken')),
 ]
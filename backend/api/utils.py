@@ -1,17 +1,22 @@
+import os
 from io import BytesIO
 
+from django.conf import settings
 from django.http import FileResponse
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 
+FONT_PATH = os.path.join(
+    settings.BASE_DIR, 'recipes', 'static', 'fonts', 'Roboto-Regular.ttf'
+)
+# Меняется при любой правке вёрстки, чтобы не отдавать из кэша старые файлы.
+PDF_TEMPLATE_VERSION = 1
 
-def download_pdf(request, ingredients):
-    """Метод для отправки списка покупок в pdf"""
-    response = FileResponse(content_type='application/pdf')
-    response['Content-Disposition'] = (
-        'inline; filename="shopping_list.pdf"'
-    )
+
+def render_pdf(ingredients):
+    """Список покупок в pdf, возвращает содержимое файла."""
+    # ReportLab нужен только здесь, не тянем его в каждый воркер при старте.
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
 
     buffer = BytesIO()
     page = canvas.Canvas(buffer)
@@ -19,7 +24,7 @@ def download_pdf(request, ingredients):
     pdfmetrics.registerFont(
         TTFont(
             'Roboto-Regular',
-            'static/fonts/Roboto-Regular.ttf', 'UTF-8'
+            FONT_PATH, 'UTF-8'
         )
     )
     page.setFont('Roboto-Regular', size=24)
@@ -36,7 +41,12 @@ def download_pdf(request, ingredients):
 
     page.showPage()
     page.save()
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
-    return response
+    return buffer.getvalue()
+
+
+def download_pdf(request, ingredients):
+    """Метод для отправки списка покупок в pdf"""
+    return FileResponse(
+        BytesIO(render_pdf(ingredients)), filename='shopping_list.pdf',
+        content_type='application/pdf'
+    )
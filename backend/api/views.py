@@ -1,27 +1,43 @@
-from django.db.models import Sum
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.permissions import (SAFE_METHODS, AllowAny,
+                                        IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet, ViewSet
 
+from api import reference
+from api.cards import card_response_data
+from api.conditional import (VALIDATOR_FIELDS, make_etag, not_modified,
+                             recipe_rows, recipe_validators, set_validators,
+                             user_state)
 from api.filters import IngredientsFilter, RecipesFilterSet
+from api.metrics import (recipes_created, shopping_cart_downloads,
+                         subscription_changes, user_recipe_changes)
+from api.mixins import (RequestMetricsMixin, SparseFieldsViewMixin,
+                        sparse_fields)
 from api.permissions import IsOwnerOrReadOnly
+from api.projections import ProjectedListMixin
 from api.serializers import (CartSerializer, FavoriteSerializer,
                              IngredientsSerializer, RecipesGetSerializer,
                              RecipesPostSerializer, SubscribeGetSerializer,
-                             TagsSerializer, UserSerializer)
-from api.utils import download_pdf
-from recipes.models import (Cart, Favorite, IngredientInRecipe, Ingredients,
-                            Recipes, Tags)
+                             SubscribePostSerializer, TagsSerializer,
+                             UserSerializer)
+from api.shopping_list import (FAILED, PENDING, READY, cart_ingredients,
+                               document_name, document_response, job_response,
+                               job_status, shopping_list_response)
+from api.sync import SYNC_KINDS, changes, delete_entries, parse_cursor
+from recipes.models import Cart, Favorite, Ingredients, Recipes, Tags
 from users.models import Subscribe, User
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(RequestMetricsMixin, SparseFieldsViewMixin,
+                  DjoserUserViewSet):
     """Вьюсет для модели User и Subscribe"""
 
     queryset = User.objects.all()
@@ -43,10 +59,15 @@ class UserViewSet(DjoserUserViewSet):
     def subscriptions(self, request):
         """Получить подписки пользователя"""
 
+        authors = self.paginate_queryset(
+            User.objects.filter(following__user=request.user)
+        )
+        context = self.get_serializer_context()
+        context['user_state'] = (
+            set(), set(), {author.pk for author in authors}
+        )
         serializer = SubscribeGetSerializer(
-            self.paginate_queryset(
-                Subscribe.objects.filter(user=request.user)
-            ), many=True, context={'request': request}
+            authors, many=True, context=context
         )
         return self.get_paginated_response(serializer.data)
 
@@ -54,16 +75,15 @@ class UserViewSet(DjoserUserViewSet):
         methods=['post'],
         detail=True, permission_classes=[IsAuthenticated]
     )
-    def subscribe(self, request, pk):
+    def subscribe(self, request, id):
         """Функция подписки."""
 
-        data = {
-            'user': request.user.id,
-            'author': pk
-        }
-        serializer = SubscribeGetSerializer(data=data)
+        serializer = SubscribePostSerializer(
+            data={'author': id}, context={'request': request}
+        )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        subscription_changes.inc(operation='add')
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(
@@ -72,14 +92,15 @@ class UserViewSet(DjoserUserViewSet):
     )
     def unsubscribe(self, request, id):
         """Функция отписки."""
-        instance = get_object_or_404(
-            Subscribe, user=request.user, author_id=id
-        )
-        instance.delete()
+        if not delete_entries(
+            Subscribe.objects.filter(user=request.user, author_id=id)
+        )[0]:
+            raise Http404
+        subscription_changes.inc(operation='remove')
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class IngredientsViewSet(ReadOnlyModelViewSet):
+class IngredientsViewSet(ProjectedListMixin, ReadOnlyModelViewSet):
     """Вьюсет для модели Ingredients"""
 
     serializer_class = IngredientsSerializer
@@ -89,7 +110,7 @@ class IngredientsViewSet(ReadOnlyModelViewSet):
     search_fields = ('^name',)
 
 
-class TagsViewSet(ReadOnlyModelViewSet):
+class TagsViewSet(ProjectedListMixin, ReadOnlyModelViewSet):
     """Вьюсет для модели Tags"""
 
     serializer_class = TagsSerializer
@@ -97,26 +118,169 @@ class TagsViewSet(ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class RecipesViewSet(ModelViewSet):
+class BootstrapViewSet(RequestMetricsMixin, ViewSet):
+    """Всё, что нужно SPA при загрузке, одним запросом.
+
+    Текущий пользователь, все теги и id избранного, корзины и подписок:
+    по одному запросу на множество, флаги рецептов клиент ставит сам.
+    Теги берутся из кэша справочников; если клиент передал
+    ?tags_version= с текущей версией, вместо них отдаётся null.
+    """
+
+    permission_classes = [AllowAny]
+
+    def list(self, request):
+        user = request.user
+        versions = reference.current_versions()
+        tags_version = versions.get('tags')
+        tags = None
+        if request.query_params.get('tags_version') != str(tags_version):
+            tags = [
+                dict(row) for _, row in sorted(
+                    reference.tags.snapshot(versions).items()
+                )
+            ]
+        data = {
+            'user': None, 'tags': tags, 'tags_version': tags_version,
+            'favorites': [], 'shopping_cart': [], 'subscriptions': [],
+        }
+        if user.is_authenticated:
+            data['user'] = UserSerializer(
+                user, context={'request': request}
+            ).data
+            for key, model, field in SYNC_KINDS:
+                data[key] = list(model.objects.filter(
+                    user=user
+                ).order_by(field).values_list(field, flat=True))
+        etag = make_etag([request.accepted_renderer.format, data])
+        response = not_modified(request, etag, None)
+        if response is not None:
+            return response
+        return set_validators(Response(data), etag, None)
+
+
+class SyncViewSet(RequestMetricsMixin, ViewSet):
+    """Изменения избранного, корзины и подписок после ?since=.
+
+    Без курсора или со слишком старым курсором отдаётся полный список с
+    reset: true. Курсор для следующего запроса - в поле cursor.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        since = request.query_params.get('since')
+        return Response(changes(
+            request.user, parse_cursor(since) if since else None
+        ))
+
+
+class RecipesViewSet(RequestMetricsMixin, SparseFieldsViewMixin,
+                     ModelViewSet):
     """Вьюсет для модели Recipes, Favorite и Cart"""
 
-    queryset = Recipes.objects.select_related('author').prefetch_related(
-        'tags', 'ingredients'
-    )
+    queryset = Recipes.objects.select_related('author')
+    # Поля модели, которые можно не читать из БД при ?fields=.
+    deferrable_fields = ('name', 'image', 'text', 'cooking_time')
     pagination_class = PageNumberPagination
     permission_classes = [IsOwnerOrReadOnly]
     filterset_class = RecipesFilterSet
+    # Множества user_state() текущей страницы для флагов сериализатора.
+    user_state = None
 
     def get_permissions(self):
         if self.request.method == 'POST':
             self.permission_classes = [IsAuthenticated]
         return super().get_permissions()
 
+    def get_queryset(self):
+        """Автор загружается, только если попадёт в ответ.
+
+        Теги и ингредиенты сериализатор берёт из кэша справочников.
+        """
+        fields, expand = sparse_fields(self.request)
+        if self.request.method not in SAFE_METHODS:
+            return super().get_queryset()
+        if fields is None:
+            return super().get_queryset()
+        queryset = Recipes.objects.only('id', 'author', *(
+            name for name in self.deferrable_fields if name in fields
+        ))
+        if 'author' in fields and 'author' in expand:
+            queryset = queryset.select_related('author')
+        return queryset
+
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PUT', 'PATCH']:
             return RecipesPostSerializer
         return RecipesGetSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['user_state'] = self.user_state
+        return context
+
+    def remember_user_state(self, request, rows):
+        """user_state() строк для ETag и флагов, None для анонима."""
+        if not request.user.is_authenticated:
+            return None
+        state = user_state(request.user, rows)
+        self.user_state = [set(ids) for ids in state]
+        return state
+
+    def list(self, request, *args, **kwargs):
+        """Страница рецептов с ETag; 304 без загрузки связей."""
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.paginate_queryset(
+            queryset.values_list(*VALIDATOR_FIELDS)
+        )
+        if rows is None:
+            return super().list(request, *args, **kwargs)
+        state = self.remember_user_state(request, rows)
+        etag, last_modified = recipe_validators(
+            request, rows, self.paginator.page.paginator.count, state=state
+        )
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        if settings.RECIPE_CARDS and sparse_fields(request)[0] is None:
+            return set_validators(self.get_paginated_response(
+                card_response_data(request, rows, state)
+            ), etag, last_modified)
+        recipes = queryset.in_bulk([pk for pk, _, _ in rows])
+        serializer = self.get_serializer(
+            [recipes[pk] for pk, _, _ in rows if pk in recipes], many=True
+        )
+        return set_validators(
+            self.get_paginated_response(serializer.data), etag,
+            last_modified
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт с ETag и Last-Modified; 304 до сериализации."""
+        rows = recipe_rows(self.get_queryset(), kwargs['pk'])
+        if not rows:
+            return super().retrieve(request, *args, **kwargs)
+        etag, last_modified = recipe_validators(
+            request, rows, state=self.remember_user_state(request, rows)
+        )
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(
+            super().retrieve(request, *args, **kwargs), etag, last_modified
+        )
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        recipes_created.inc()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            for model in (Favorite, Cart):
+                delete_entries(model.objects.filter(recipe=instance))
+            super().perform_destroy(instance)
+
     @action(
         methods=['post'],
         detail=True, permission_classes=[IsAuthenticated]
@@ -154,18 +318,37 @@ class RecipesViewSet(ModelViewSet):
     )
     def download_shopping_cart(self, request):
         """Скачать список покупок в pdf"""
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__cart__user=request.user).values_list(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(Sum('amount')).order_by('name')
+        ingredients = cart_ingredients(request.user)
 
         if ingredients:
-            return download_pdf(request, ingredients)
+            shopping_cart_downloads.inc()
+            return shopping_list_response(request, ingredients)
         return Response(
             {'errors': 'Нет рецептов в списке покупок'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(
+        methods=['get'], detail=False, permission_classes=[IsAuthenticated],
+        url_path=r'download_shopping_cart/(?P<key>[0-9a-f]{64})',
+        url_name='shopping-list-job'
+    )
+    def shopping_list_job(self, request, key):
+        """Состояние фоновой генерации списка покупок пользователя."""
+        job = job_status(document_name(request.user, key))
+        if job == READY:
+            response = document_response(request, key)
+            if response is not None:
+                return response
+        if job == PENDING:
+            return job_response(request, key)
+        if job == FAILED:
+            return Response(
+                {'errors': 'Не удалось сформировать список покупок'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        raise Http404
+
     @staticmethod
     def create_entry(serializer_class, pk, request):
         data = {
@@ -175,10 +358,19 @@ class RecipesViewSet(ModelViewSet):
         serializer = serializer_class(data=data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        user_recipe_changes.inc(
+            kind=serializer_class.Meta.model._meta.model_name,
+            operation='add'
+        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @staticmethod
     def delete_entry(model, pk, request):
-        instance = get_object_or_404(model, user=request.user, recipe=pk)
-        instance.delete()
+        if not delete_entries(
+            model.objects.filter(user=request.user, recipe=pk)
+        )[0]:
+            raise Http404
+        user_recipe_changes.inc(
+            kind=model._meta.model_name, operation='remove'
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
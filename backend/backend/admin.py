@@ -0,0 +1,135 @@
+"""Общие части админки для больших таблиц.
+
+Счётчики по связанным таблицам считаются коррелированными подзапросами
+только для строк текущей страницы, фильтры по полям с большим числом
+значений заменены полем ввода, а пагинатор берёт оценку числа строк из
+статистики СУБД вместо COUNT(*) по всей таблице.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+
+def count_subquery(model, field):
+    """Число строк model, у которых field указывает на текущий объект."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def estimate_count(queryset):
+    """Оценка числа строк таблицы без её полного просмотра.
+
+    Как и планировщик PostgreSQL, плотность строк из статистики
+    (reltuples / relpages) умножается на текущий размер таблицы, так что
+    оценка не отстаёт после массовой загрузки до ANALYZE. Без статистики
+    (reltuples 0 или -1) и для остальных СУБД возвращается None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        # В SQLite нет дешёвой оценки: MAX(rowid) не уменьшается после
+        # удалений, поэтому там считаем точно.
+        return None
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples, relpages, pg_relation_size(oid) / '
+            "current_setting('block_size')::int FROM pg_class "
+            'WHERE oid = %s::regclass', [connection.ops.quote_name(table)]
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    reltuples, relpages, pages = row
+    if not reltuples or reltuples < 0 or not relpages:
+        return None
+    return int(reltuples / relpages * pages)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Для нефильтрованного списка большой таблицы число строк оценивается.
+
+    Оценка используется, только если она есть и не меньше
+    ADMIN_ESTIMATED_COUNT_THRESHOLD, иначе выполняется точный COUNT(*).
+    Поиск и фильтры всегда считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+        estimate = estimate_count(self.object_list)
+        if (
+            estimate is None
+            or estimate < settings.ADMIN_ESTIMATED_COUNT_THRESHOLD
+        ):
+            return super().count
+        return estimate
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр с полем ввода вместо списка всех значений."""
+
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.lookup: self.value().strip()})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'hidden_params': [
+                (key, value)
+                for key, value in changelist.get_filters_params().items()
+                if key != self.parameter_name
+            ],
+            'clear_query_string': changelist.get_query_string(
+                remove=[self.parameter_name]
+            ),
+        }
+
+
+class RangeFilter(admin.SimpleListFilter):
+    """Фильтр по диапазонам числового поля из ranges."""
+
+    field = None
+    ranges = ()
+
+    def lookups(self, request, model_admin):
+        return [(str(number), label)
+                for number, (label, _, _) in enumerate(self.ranges)]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        try:
+            _, low, high = self.ranges[int(self.value())]
+        except (IndexError, ValueError):
+            return queryset
+        if low is not None:
+            queryset = queryset.filter(**{f'{self.field}__gte': low})
+        if high is not None:
+            queryset = queryset.filter(**{f'{self.field}__lt': high})
+        return queryset
+
+
+class ScalableAdminMixin:
+    """Пагинация с оценкой числа строк и без второго COUNT(*)."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,29 @@
+"""
+ASGI config for backend project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Запуск: gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker.
+Вместе с ASYNC_VIEWS=true теги, ингредиенты, рецепт, подписки и список
+покупок обслуживаются асинхронными обёртками из api.async_views.
+Постоянные соединения с базой под ASGI выключены, см. DB_CONN_MAX_AGE.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    # В Django 3.2 все thread_sensitive-вызовы ORM выполняются в одном
+    # общем потоке; собственный контекст даёт каждому запросу свой поток,
+    # как это делает ASGIHandler начиная с Django 4.0.
+    async with ThreadSensitiveContext():
+        await django_application(scope, receive, send)
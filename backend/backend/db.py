@@ -0,0 +1,45 @@
+"""Обслуживание соединений с базой данных."""
+import django
+from django.conf import settings
+from django.db import connections
+
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+)
+
+
+def tune_sqlite(sender, connection, **kwargs):
+    """WAL и настройки кэша для SQLite при открытии соединения."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+
+
+def check_connections_health(**kwargs):
+    """Закрывает оборвавшиеся постоянные соединения в начале запроса.
+
+    Замена CONN_HEALTH_CHECKS для Django до 4.1, начиная с 4.1 настройки
+    включают встроенную проверку. Проверяются только уже открытые
+    постоянные соединения потока.
+    """
+    for connection in connections.all():
+        if (connection.connection is not None
+                and connection.settings_dict['CONN_MAX_AGE']
+                and not connection.in_atomic_block
+                and not connection.is_usable()):
+            connection.close()
+
+
+def connect_signals():
+    from django.core.signals import request_started
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(tune_sqlite)
+    if settings.DB_CONN_HEALTH_CHECKS and django.VERSION < (4, 1):
+        request_started.connect(check_connections_health)
@@ -0,0 +1,84 @@
+"""Распределение чтения по репликам базы данных."""
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def replica_aliases():
+    return [alias for alias in connections if alias.startswith('replica')]
+
+
+class PrimaryReplicaRouter:
+    """Чтение с реплик только внутри безопасных запросов, запись в default.
+
+    Вне запросов (команды, миграции, фоновые задачи) и для пользователей,
+    недавно что-то изменивших, всё читается из default.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        replicas = replica_aliases()
+        if replicas and read_from_replica.get():
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def use_replica(request):
+    return (
+        request.method in SAFE_METHODS
+        and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+    )
+
+
+def pin_primary(request, response):
+    if request.method not in SAFE_METHODS and replica_aliases():
+        response.set_cookie(
+            settings.REPLICA_PIN_COOKIE, '1',
+            max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+            samesite='Lax'
+        )
+    return response
+
+
+@sync_and_async_middleware
+def ReplicaRoutingMiddleware(get_response):
+    """Включает чтение с реплик для GET и закрепляет автора записи на default.
+
+    После небезопасного запроса клиент получает cookie на
+    REPLICA_PIN_SECONDS секунд, и пока она жива, его чтения идут в
+    default, так что он сразу видит собственные изменения. Под ASGI
+    возвращается асинхронная middleware, под WSGI - синхронная.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = read_from_replica.set(use_replica(request))
+            try:
+                response = await get_response(request)
+            finally:
+                read_from_replica.reset(token)
+            return pin_primary(request, response)
+    else:
+        def middleware(request):
+            token = read_from_replica.set(use_replica(request))
+            try:
+                response = get_response(request)
+            finally:
+                read_from_replica.reset(token)
+            return pin_primary(request, response)
+    return middleware
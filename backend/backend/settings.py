@@ -1,5 +1,9 @@
 import os
+import sys
+import tempfile
 
+import django
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -31,6 +35,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.QueryInstrumentationMiddleware',
+    'api.profiling.ProfilingMiddleware',
+    'backend.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -41,6 +48,85 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+REQUEST_INSTRUMENTATION = (
+    os.getenv('REQUEST_INSTRUMENTATION', default='False').lower() == 'true'
+)
+REQUEST_STATS_DIR = os.getenv(
+    'REQUEST_STATS_DIR',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram_request_stats')
+)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='False').lower() == 'true'
+METRICS_DIR = os.getenv(
+    'METRICS_DIR',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram_metrics')
+)
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', default=1))
+
+PROFILING_ENABLED = (
+    os.getenv('PROFILING_ENABLED', default='False').lower() == 'true'
+)
+PROFILING_TOKENS = [
+    token for token in os.getenv('PROFILING_TOKENS', default='').split(',')
+    if token
+]
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', default=0))
+PROFILING_DIR = os.getenv(
+    'PROFILING_DIR',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram_profiles')
+)
+PROFILING_MAX_CAPTURES = int(os.getenv('PROFILING_MAX_CAPTURES', default=50))
+
+SHOPPING_LIST_ASYNC = (
+    os.getenv('SHOPPING_LIST_ASYNC', default='False').lower() == 'true'
+)
+SHOPPING_LIST_DIR = os.getenv(
+    'SHOPPING_LIST_DIR',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram_shopping_lists')
+)
+SHOPPING_LIST_WORKERS = int(os.getenv('SHOPPING_LIST_WORKERS', default=2))
+SHOPPING_LIST_MAX_FILES = int(
+    os.getenv('SHOPPING_LIST_MAX_FILES', default=1000)
+)
+SHOPPING_LIST_MAX_BYTES = int(
+    os.getenv('SHOPPING_LIST_MAX_BYTES', default=100 * 1024 * 1024)
+)
+SHOPPING_LIST_JOB_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_JOB_TIMEOUT', default=60)
+)
+
+FAST_JSON = os.getenv('FAST_JSON', default='False').lower() == 'true'
+FAST_SERIALIZATION = (
+    os.getenv('FAST_SERIALIZATION', default='False').lower() == 'true'
+)
+
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(
+    os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=100000)
+)
+
+PURGE_DIR = os.getenv(
+    'PURGE_DIR', default=os.path.join(tempfile.gettempdir(), 'foodgram_purge')
+)
+PURGE_BATCH_SIZE = int(os.getenv('PURGE_BATCH_SIZE', default=1000))
+PURGE_IMAGE_GRACE_SECONDS = int(
+    os.getenv('PURGE_IMAGE_GRACE_SECONDS', default=3600)
+)
+
+RECIPE_CARDS = os.getenv('RECIPE_CARDS', default='True').lower() == 'true'
+
+REFERENCE_CACHE = (
+    os.getenv('REFERENCE_CACHE', default='True').lower() == 'true'
+)
+
+SYNC_CURSOR_OVERLAP = int(os.getenv('SYNC_CURSOR_OVERLAP', default=5))
+SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', default=30))
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', default=10000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', default=60))
+# Кэш токенов включается только с общим для воркеров кэшем (Redis,
+# Memcached): в нём хранятся версии пользователей для отзыва токенов.
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS', default=None)
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -60,6 +146,29 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='False').lower() == 'true'
+# Настройки загружает импорт backend.asgi, если сервер запущен под ASGI.
+ASGI = ASGI_APPLICATION.rpartition('.')[0] in sys.modules
+
+# Под ASGI у каждого запроса свой поток, а соединения с базой привязаны
+# к потоку: постоянные соединения копились бы с каждым запросом.
+DB_CONN_MAX_AGE = int(
+    os.getenv('DB_CONN_MAX_AGE', default=0 if ASGI else 60)
+)
+if ASGI and DB_CONN_MAX_AGE:
+    raise ImproperlyConfigured(
+        'Под ASGI постоянные соединения не поддерживаются, '
+        'задайте DB_CONN_MAX_AGE=0.'
+    )
+DB_CONN_HEALTH_CHECKS = (
+    os.getenv('DB_CONN_HEALTH_CHECKS', default='True').lower() == 'true'
+)
+DB_POOL = os.getenv('DB_POOL', default='False').lower() == 'true'
+if DB_POOL and django.VERSION < (5, 1):
+    raise ImproperlyConfigured(
+        'DB_POOL=true поддерживается только с Django 5.1 и psycopg 3.'
+    )
 
 if os.getenv('DB_ENGINE') == 'django.db.backends.postgresql':
     DATABASES = {
@@ -69,18 +178,52 @@ if os.getenv('DB_ENGINE') == 'django.db.backends.postgresql':
             'USER': os.getenv('POSTGRES_USER', default='postgres'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
             'HOST': os.getenv('DB_HOST', default='db'),
-            'PORT': os.getenv('DB_PORT', default='5432')
+            'PORT': os.getenv('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
         }
     }
+    if django.VERSION >= (4, 1):
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+    if DB_POOL:
+        # Встроенный пул psycopg3 несовместим с постоянными соединениями.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', default=2)),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', default=10)),
+                'timeout': int(os.getenv('DB_POOL_TIMEOUT', default=10)),
+            },
+        }
 if os.getenv('DB_ENGINE') == 'django.db.backends.sqlite':
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {'timeout': 20},
+            # В памяти SQLite блокирует таблицы без ожидания timeout,
+            # а тестам с параллельными запросами нужна файловая база.
+            'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
         }
 
     }
 
+# Реплики для чтения: хосты PostgreSQL или пути к файлам SQLite.
+DB_REPLICAS = [
+    replica for replica in os.getenv('DB_REPLICAS', default='').split(',')
+    if replica
+]
+for number, replica in enumerate(DB_REPLICAS, 1):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        ('NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3')
+         else 'HOST'): replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['backend.routers.PrimaryReplicaRouter']
+REPLICA_PIN_COOKIE = 'db_primary'
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', default=5))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -126,8 +269,13 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
 
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS':
@@ -10,7 +10,13 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# URLconf с вьюхами загружается здесь, а не на первом запросе. С
+# gunicorn --preload это происходит один раз в мастере, воркеры
+# получают готовые модули через fork и стартуют без импорта.
+get_resolver().url_patterns
@@ -1,8 +1,36 @@
 from django.contrib import admin
+from django.db.models import Prefetch
 
+from backend.admin import (InputFilter, RangeFilter, ScalableAdminMixin,
+                           count_subquery)
+from recipes import purge
 from recipes.models import Cart, Favorite, Ingredients, Recipes, Tags
 
 
+class AuthorFilter(InputFilter):
+    title = 'автор (username)'
+    parameter_name = 'author'
+    lookup = 'author__username'
+
+
+class RecipeFilter(InputFilter):
+    title = 'рецепт (id)'
+    parameter_name = 'recipe'
+    lookup = 'recipe_id'
+
+
+class CookingTimeFilter(RangeFilter):
+    title = 'время приготовления'
+    parameter_name = 'cooking_time'
+    field = 'cooking_time'
+    ranges = (
+        ('до 15 минут', None, 15),
+        ('15-30 минут', 15, 30),
+        ('30-60 минут', 30, 60),
+        ('больше часа', 60, None),
+    )
+
+
 @admin.register(Tags)
 class TagsAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'color', 'slug')
@@ -33,42 +61,73 @@ class IngredientInRecipeInline(admin.TabularInline):
 
 
 @admin.register(Recipes)
-class RecipesAdmin(admin.ModelAdmin):
+class RecipesAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = (
         'id', 'name', 'author', 'get_ingredients', 'get_favorites_count',
         'get_shopping_cart_count'
     )
-    search_fields = ('id', 'name', 'tags', 'ingredients')
-    list_filter = ('name', 'tags', 'author')
+    list_select_related = ('author',)
+    search_fields = ('id', 'name')
+    list_filter = (
+        'tags', AuthorFilter, CookingTimeFilter,
+        ('pub_date', admin.DateFieldListFilter),
+    )
     autocomplete_fields = ('author', 'tags')
     inlines = [IngredientInRecipeInline]
+    actions = ('purge_in_background',)
+
+    def get_queryset(self, request):
+        """Счётчики и ингредиенты загружаются только для строк страницы."""
+        return super().get_queryset(request).annotate(
+            favorites_count=count_subquery(Favorite, 'recipe'),
+            shopping_cart_count=count_subquery(Cart, 'recipe'),
+        ).prefetch_related(Prefetch(
+            'ingredients', queryset=Ingredients.objects.only(
+                'name'
+            ).order_by('-name'), to_attr='ingredients_list'
+        ))
 
     @admin.display(description='Ингредиенты')
     def get_ingredients(self, obj):
-        return list(
-            obj.ingredients.values_list('name', flat=True).order_by('-name')
-        )
+        return [ingredient.name for ingredient in obj.ingredients_list]
 
-    @admin.display(description='Добавили в избранное')
+    @admin.display(
+        description='Добавили в избранное', ordering='favorites_count'
+    )
     def get_favorites_count(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
-    @admin.display(description='Добавили в список покупок')
+    @admin.display(
+        description='Добавили в список покупок',
+        ordering='shopping_cart_count'
+    )
     def get_shopping_cart_count(self, obj):
-        return obj.cart.count()
+        return obj.shopping_cart_count
+
+    @admin.action(
+        description='Удалить в фоне пакетами', permissions=('delete',)
+    )
+    def purge_in_background(self, request, queryset):
+        job = purge.enqueue(queryset)
+        self.message_user(
+            request, f'Удаление поставлено в очередь, задача {job["id"]}. '
+            'Ход работы: python manage.py purge --jobs.'
+        )
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('recipe',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    list_filter = (RecipeFilter,)
     autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('recipe',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    list_filter = (RecipeFilter,)
     autocomplete_fields = ('user', 'recipe')
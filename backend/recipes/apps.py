@@ -4,3 +4,32 @@ from django.apps import AppConfig
 class RecipesConfig(AppConfig):
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        from django.db.models.signals import (m2m_changed, post_delete,
+                                              post_save, pre_delete, pre_save)
+
+        from recipes import signals
+        from recipes.models import (IngredientInRecipe, Ingredients, Recipes,
+                                    Tags)
+        from users.models import User
+
+        post_save.connect(
+            signals.ingredient_row_changed, sender=IngredientInRecipe
+        )
+        post_delete.connect(
+            signals.ingredient_row_changed, sender=IngredientInRecipe
+        )
+        m2m_changed.connect(
+            signals.tags_changed, sender=Recipes.tags.through
+        )
+        pre_save.connect(signals.remember_image, sender=Recipes)
+        post_save.connect(signals.image_changed, sender=Recipes)
+        post_delete.connect(signals.recipe_deleted, sender=Recipes)
+        post_save.connect(signals.tag_changed, sender=Tags)
+        post_save.connect(signals.ingredient_changed, sender=Ingredients)
+        post_save.connect(signals.author_changed, sender=User)
+        for model in (Tags, Ingredients):
+            post_save.connect(signals.reference_changed, sender=model)
+            post_delete.connect(signals.reference_changed, sender=model)
+            pre_delete.connect(signals.reference_deleted, sender=model)
@@ -0,0 +1,192 @@
+"""Загрузка справочников пачками: ORM-upsert и быстрый путь через COPY."""
+import csv
+import io
+import json
+from itertools import islice
+
+import django
+from django.db import connection, transaction
+
+from recipes.models import Ingredients
+
+JSON_CHUNK_SIZE = 64 * 1024
+COPY_CHUNK_SIZE = 64 * 1024
+EXECUTEMANY_BATCH_SIZE = 50000
+INGREDIENT_FIELDS = ('name', 'measurement_unit')
+
+
+def iter_csv_rows(file, fields):
+    """Построчное чтение csv, заголовок необязателен."""
+    reader = csv.reader(file, delimiter=',')
+    for number, row in enumerate(reader):
+        if not row or (number == 0 and tuple(row) == fields):
+            continue
+        yield dict(zip(fields, row))
+
+
+def iter_json_rows(file, fields):
+    """Потоковое чтение JSON-массива объектов без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидается JSON-массив объектов.')
+    buffer = buffer[1:]
+    chunk = None
+    while chunk != '':
+        chunk = file.read(JSON_CHUNK_SIZE)
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if buffer[position:position + 1] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise ValueError('Некорректный JSON-файл.')
+                break
+            yield {field: item[field] for field in fields}
+        buffer = buffer[position:]
+
+
+def iter_batches(rows, batch_size):
+    rows = iter(rows)
+    batch = list(islice(rows, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, batch_size))
+
+
+def upsert(model, objects, unique_fields, update_fields):
+    """INSERT ... ON CONFLICT для пачки объектов."""
+    if not update_fields:
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+        return
+    if django.VERSION >= (4, 1):
+        model.objects.bulk_create(
+            objects, update_conflicts=True,
+            unique_fields=unique_fields, update_fields=update_fields
+        )
+        return
+    key_field, = unique_fields
+    existing = model.objects.in_bulk(
+        [getattr(obj, key_field) for obj in objects], field_name=key_field
+    )
+    to_update, to_create = [], []
+    for obj in objects:
+        current = existing.get(getattr(obj, key_field))
+        if current is not None:
+            obj.pk = current.pk
+            to_update.append(obj)
+        else:
+            to_create.append(obj)
+    model.objects.bulk_update(to_update, update_fields)
+    model.objects.bulk_create(to_create, ignore_conflicts=True)
+
+
+class CsvStream(io.RawIOBase):
+    """Файлоподобный объект, отдающий строки в виде csv для COPY."""
+
+    def __init__(self, rows, fields):
+        self.rows = iter(rows)
+        self.fields = fields
+        self.buffer = b''
+        self.text = io.StringIO()
+        self.writer = csv.writer(self.text, lineterminator='\n')
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.writer.writerow([row[field] for field in self.fields])
+            self.buffer += self.text.getvalue().encode()
+            self.text.seek(0)
+            self.text.truncate()
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def copy_from_stream(cursor, sql, stream):
+    """COPY FROM STDIN через psycopg2 (copy_expert) или psycopg 3 (copy)."""
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, 'copy_expert'):
+        raw_cursor.copy_expert(sql, stream, COPY_CHUNK_SIZE)
+        return
+    with raw_cursor.copy(sql) as copy:
+        data = stream.read(COPY_CHUNK_SIZE)
+        while data:
+            copy.write(data)
+            data = stream.read(COPY_CHUNK_SIZE)
+
+
+def copy_ingredients(rows):
+    """COPY FROM STDIN во временную таблицу и один INSERT ... SELECT.
+
+    В csv-режиме COPY пустое поле стало бы NULL, а ORM хранит пустую
+    строку: NULL задан как \\N, а FORCE_NOT_NULL оставляет пустые поля
+    пустыми строками.
+    """
+    table = connection.ops.quote_name(Ingredients._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS tmp_ingredients')
+        cursor.execute(
+            'CREATE TEMP TABLE tmp_ingredients '
+            '(name varchar, measurement_unit varchar) ON COMMIT DROP'
+        )
+        copy_from_stream(
+            cursor,
+            'COPY tmp_ingredients (name, measurement_unit) FROM STDIN '
+            "WITH (FORMAT csv, NULL '\\N', "
+            'FORCE_NOT_NULL (name, measurement_unit))',
+            CsvStream(rows, INGREDIENT_FIELDS)
+        )
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            'SELECT DISTINCT name, measurement_unit FROM tmp_ingredients '
+            'ON CONFLICT (name, measurement_unit) DO NOTHING'
+        )
+
+
+def executemany_ingredients(rows, batch_size=EXECUTEMANY_BATCH_SIZE):
+    """INSERT OR IGNORE через executemany крупными транзакциями (SQLite)."""
+    table = connection.ops.quote_name(Ingredients._meta.db_table)
+    sql = (
+        f'INSERT OR IGNORE INTO {table} (name, measurement_unit) '
+        'VALUES (%s, %s)'
+    )
+    for batch in iter_batches(rows, batch_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                sql, [(row['name'], row['measurement_unit']) for row in batch]
+            )
+
+
+def orm_load(model, rows, batch_size, unique_fields, update_fields=()):
+    """Upsert через ORM, одна транзакция на пачку."""
+    for batch in iter_batches(rows, batch_size):
+        with transaction.atomic():
+            upsert(
+                model, [model(**row) for row in batch],
+                unique_fields, update_fields
+            )
+
+
+def fast_load_ingredients(rows, batch_size=EXECUTEMANY_BATCH_SIZE):
+    """Быстрая загрузка ингредиентов в обход ORM.
+
+    PostgreSQL - COPY, SQLite - executemany, остальные СУБД - ORM.
+    """
+    if connection.vendor == 'postgresql':
+        copy_ingredients(rows)
+    elif connection.vendor == 'sqlite':
+        executemany_ingredients(rows, batch_size)
+    else:
+        orm_load(Ingredients, rows, batch_size, INGREDIENT_FIELDS)
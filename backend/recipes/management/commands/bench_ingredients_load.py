@@ -0,0 +1,70 @@
+import json
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+
+from recipes.loaders import INGREDIENT_FIELDS, fast_load_ingredients, orm_load
+from recipes.models import Ingredients
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+ORM_BATCH_SIZE = 5000
+
+
+class Rollback(Exception):
+    """Откат транзакции после замера, чтобы не засорять базу."""
+
+
+def synthetic_rows(size):
+    for number in range(size):
+        yield {'name': f'bench-{number}', 'measurement_unit': 'г'}
+
+
+class Command(BaseCommand):
+    help = ('Сравнение скорости загрузки ингредиентов через ORM и '
+            'COPY/executemany. Запуск: python manage.py '
+            'bench_ingredients_load --sizes 10000 100000.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+            help='Размеры выборок в строках.'
+        )
+        parser.add_argument(
+            '--output', help='Файл для сохранения результатов в JSON.'
+        )
+
+    def handle(self, *args, **options):
+        loaders = {
+            'orm': lambda rows: orm_load(
+                Ingredients, rows, ORM_BATCH_SIZE, INGREDIENT_FIELDS
+            ),
+            'fast': fast_load_ingredients,
+        }
+        results = []
+        for size in options['sizes']:
+            for method, load in loaders.items():
+                seconds = self.measure(load, size)
+                results.append({
+                    'vendor': connection.vendor, 'method': method,
+                    'rows': size, 'seconds': round(seconds, 3),
+                    'rows_per_second': round(size / seconds),
+                })
+                self.stdout.write(
+                    f'{connection.vendor} {method:>4} {size:>8} строк: '
+                    f'{seconds:.2f} сек., {size / seconds:.0f} строк/сек.'
+                )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def measure(load, size):
+        try:
+            with transaction.atomic():
+                start_time = time.perf_counter()
+                load(synthetic_rows(size))
+                seconds = time.perf_counter() - start_time
+                raise Rollback
+        except Rollback:
+            return seconds
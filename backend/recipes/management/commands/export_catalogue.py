@@ -0,0 +1,80 @@
+import resource
+import sys
+import time
+from collections import Counter
+
+from django.core.management import BaseCommand, CommandError
+
+from recipes.exports import export_csv, export_jsonl, open_text
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = ('Потоковая выгрузка тегов, ингредиентов, рецептов и их связей '
+            'в JSON Lines или CSV, с .gz - в сжатом виде. '
+            'Запуск: python manage.py export_catalogue PATH.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help=('Файл .jsonl[.gz] или "-" для stdout; для csv - '
+                          'каталог.')
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl',
+            help='Формат выгрузки.'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжимать файлы csv. Для jsonl достаточно суффикса .gz.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help='Сколько строк читать из курсора за раз.'
+        )
+        parser.add_argument(
+            '--with-emails', action='store_true',
+            help='Выгрузить email авторов рецептов. По умолчанию только '
+                 'username.'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля.')
+        path, chunk_size = options['path'], options['chunk_size']
+        with_emails = options['with_emails']
+        if options['format'] == 'jsonl' and options['gzip'] and (
+            not path.endswith('.gz')
+        ):
+            path = f'{path}.gz' if path != '-' else path
+        counts = Counter()
+        start_time = time.monotonic()
+
+        def progress(section):
+            counts[section] += 1
+            if counts[section] % (chunk_size * 50) == 0:
+                self.report(section, counts[section], start_time)
+
+        if options['format'] == 'csv':
+            export_csv(
+                path, options['gzip'], chunk_size, progress, with_emails
+            )
+        elif path == '-':
+            export_jsonl(sys.stdout, chunk_size, progress, with_emails)
+        else:
+            with open_text(path, 'w') as file:
+                export_jsonl(file, chunk_size, progress, with_emails)
+        for section, count in counts.items():
+            self.report(section, count, start_time)
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгрузка завершена за {time.monotonic() - start_time:.2f} сек., '
+            f'пик памяти процесса '
+            f'{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} МБ.'
+        ))
+
+    def report(self, section, count, start_time):
+        elapsed = time.monotonic() - start_time
+        self.stderr.write(
+            f'{section}: выгружено {count} строк, '
+            f'{count / elapsed if elapsed else 0:.0f} строк/сек.'
+        )
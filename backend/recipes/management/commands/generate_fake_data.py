@@ -0,0 +1,176 @@
+import random
+import time
+from itertools import accumulate
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.loaders import iter_batches
+from recipes.models import (Cart, Favorite, IngredientInRecipe, Ingredients,
+                            Recipes, Tags)
+from users.models import Subscribe, User
+
+BATCH_SIZE = 5000
+FAKE_IMAGE = 'recipes/fake.png'
+UNUSABLE_PASSWORD = '!'
+
+
+class SkewedChoice:
+    """Выбор объектов по закону Ципфа: вес i-го объекта 1 / i ** skew."""
+
+    def __init__(self, rng, population, skew):
+        self.rng = rng
+        self.population = list(population)
+        self.cum_weights = list(accumulate(
+            1 / rank ** skew for rank in range(1, len(self.population) + 1)
+        ))
+
+    def __call__(self, count=1):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights, k=count
+        )
+
+
+class Command(BaseCommand):
+    help = ('Генерация синтетических пользователей, рецептов, избранного, '
+            'корзин и подписок. Запуск: python manage.py generate_fake_data '
+            '--users 1000 --recipes 10000 --seed 42.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, default=8,
+            help='Среднее число ингредиентов в рецепте.'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Среднее число рецептов в избранном у пользователя.'
+        )
+        parser.add_argument(
+            '--cart', type=int, default=5,
+            help='Среднее число рецептов в корзине у пользователя.'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Среднее число подписок у пользователя.'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help=('Показатель распределения Ципфа для авторов, рецептов и '
+                  'ингредиентов; 0 - равномерное распределение.')
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--prefix', default='fake',
+            help='Префикс username/email создаваемых пользователей.'
+        )
+
+    def handle(self, *args, **options):
+        tags = list(Tags.objects.values_list('id', flat=True))
+        ingredients = list(Ingredients.objects.values_list('id', flat=True))
+        if not tags or not ingredients:
+            raise CommandError(
+                'Сначала загрузите теги и ингредиенты: '
+                'python manage.py load_csv_data.'
+            )
+        if User.objects.filter(
+            username__startswith=f'{options["prefix"]}-'
+        ).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {options["prefix"]} уже есть, '
+                'укажите другой --prefix.'
+            )
+        self.rng = random.Random(options['seed'])
+        self.skew = options['skew']
+        start_time = time.monotonic()
+        with transaction.atomic():
+            users = self.create_users(options['users'], options['prefix'])
+            recipes = self.create_recipes(users, options['recipes'])
+            self.create_recipe_relations(
+                recipes, tags, ingredients, options['ingredients_per_recipe']
+            )
+            for model, average in (
+                (Favorite, options['favorites']), (Cart, options['cart'])
+            ):
+                self.create_user_recipes(model, users, recipes, average)
+            self.create_subscriptions(users, options['subscriptions'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Генерация завершена за {time.monotonic() - start_time:.2f} сек.'
+        ))
+
+    def bulk_create(self, model, objects):
+        created = 0
+        for batch in iter_batches(objects, BATCH_SIZE):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+        self.stdout.write(f'{model.__name__}: {created} строк.')
+
+    def sample_count(self, average):
+        return min(int(self.rng.expovariate(1 / average)) + 1, 10 * average)
+
+    def create_users(self, count, prefix):
+        self.bulk_create(User, (
+            User(
+                username=f'{prefix}-{number}',
+                email=f'{prefix}-{number}@example.com',
+                first_name=f'Имя {number}', last_name=f'Фамилия {number}',
+                password=UNUSABLE_PASSWORD,
+            ) for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=f'{prefix}-'
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_recipes(self, users, count):
+        authors = SkewedChoice(self.rng, users, self.skew)
+        first_id = (Recipes.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0)
+        self.bulk_create(Recipes, (
+            Recipes(
+                author_id=authors()[0], name=f'Рецепт {number}',
+                text=f'Описание рецепта {number}. ' * 10, image=FAKE_IMAGE,
+                cooking_time=self.rng.randint(1, 180),
+            ) for number in range(count)
+        ))
+        return list(Recipes.objects.filter(id__gt=first_id).order_by(
+            'id').values_list('id', flat=True))
+
+    def create_recipe_relations(self, recipes, tags, ingredients, average):
+        choose_ingredient = SkewedChoice(self.rng, ingredients, self.skew)
+        through = Recipes.tags.through
+        self.bulk_create(through, (
+            through(recipes_id=recipe, tags_id=tag)
+            for recipe in recipes
+            for tag in self.rng.sample(
+                tags, self.rng.randint(1, min(3, len(tags)))
+            )
+        ))
+        self.bulk_create(IngredientInRecipe, (
+            IngredientInRecipe(
+                recipe_id=recipe, ingredient_id=ingredient,
+                amount=self.rng.randint(1, 1000),
+            )
+            for recipe in recipes
+            for ingredient in set(choose_ingredient(
+                self.sample_count(average)
+            ))
+        ))
+
+    def create_user_recipes(self, model, users, recipes, average):
+        choose_recipe = SkewedChoice(self.rng, recipes, self.skew)
+        self.bulk_create(model, (
+            model(user_id=user, recipe_id=recipe)
+            for user in users
+            for recipe in set(choose_recipe(self.sample_count(average)))
+        ))
+
+    def create_subscriptions(self, users, average):
+        choose_author = SkewedChoice(self.rng, users, self.skew)
+        self.bulk_create(Subscribe, (
+            Subscribe(user_id=user, author_id=author)
+            for user in users
+            for author in set(choose_author(self.sample_count(average)))
+            if author != user
+        ))
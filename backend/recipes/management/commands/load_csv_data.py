@@ -1,49 +1,122 @@
-import csv
-import datetime
+import os
+import time
 
-from django.core.management import BaseCommand
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
 
+from recipes.loaders import (fast_load_ingredients, iter_csv_rows,
+                             iter_json_rows, orm_load)
 from recipes.models import Ingredients, Tags
+from recipes.signals import bump_reference_versions
 
-csv_files = {
-    Tags: 'tags.csv',
-    Ingredients: 'ingredients.csv'
-}
+DEFAULT_BATCH_SIZE = 5000
 
-fields = {
-    Tags: ('name', 'color', 'slug'),
-    Ingredients: ('name', 'measurement_unit')
+# Модель -> (поля в файле, поля уникального ключа, обновляемые поля).
+IMPORT_SPECS = {
+    Tags: (('name', 'color', 'slug'), ('slug',), ('name', 'color')),
+    Ingredients: (
+        ('name', 'measurement_unit'), ('name', 'measurement_unit'), ()
+    ),
 }
 
+IMPORT_FILES = (
+    (Tags, ('tags.csv',)),
+    (Ingredients, ('ingredients.csv', 'ingredients.json')),
+)
+
 
 class Command(BaseCommand):
-    help = ('Загрузка data из data/*.csv.'
-            'Запуск: python manage.py load_csv_data.')
+    help = ('Загрузка тегов и ингредиентов из data/*.csv и data/*.json '
+            'пачками с upsert. Запуск: python manage.py load_csv_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=os.path.join(settings.BASE_DIR, 'data'),
+            help='Каталог с файлами данных.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одной пачке.'
+        )
+        parser.add_argument(
+            '--format', choices=('csv', 'json'), default='csv',
+            help='Формат файла ингредиентов.'
+        )
+        parser.add_argument(
+            '--fast', action='store_true',
+            help=('Загружать ингредиенты в обход ORM: COPY для PostgreSQL, '
+                  'executemany для SQLite.')
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Прочитать файлы без записи в базу.'
+        )
 
     def handle(self, *args, **options):
-        print('Старт импорта')
-        start_time = datetime.datetime.now()
-
-        try:
-            for model, file in csv_files.items():
-                to_create = []
-                with open(f'../backend/data/{file}', encoding='utf-8') as f:
-                    reader = csv.DictReader(f, delimiter=',')
-                    for row in reader:
-                        if model in fields and len(fields[model]) == 3:
-                            row[fields[model][2]] = row.pop(fields[model][0])
-                        to_create.append(model(**row))
-
-                model.objects.bulk_create(to_create)
-                print(f'{len(to_create)}'
-                      f'записей загружено в таблицу {model.__name__}')
-
-            print(f'Загрузка данных завершена за'
-                  f'{(datetime.datetime.now() - start_time).total_seconds()}'
-                  f'сек.')
-
-        except Exception as error:
-            print(f'Сбой в работе импорта: {error}.')
-
-        finally:
-            print('Завершена работа импорта.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        start_time = time.monotonic()
+        for model, files in IMPORT_FILES:
+            file = next(
+                (name for name in files
+                 if name.endswith(options['format'])), files[0]
+            )
+            self.load_file(
+                model, os.path.join(options['path'], file), options
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершён за {time.monotonic() - start_time:.2f} сек.'
+        ))
+
+    def load_file(self, model, path, options):
+        fields, unique_fields, update_fields = IMPORT_SPECS[model]
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден.')
+        reader = iter_json_rows if path.endswith('.json') else iter_csv_rows
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        # Пробный прогон не обращается к базе.
+        count_before = None if dry_run else model.objects.count()
+        with open(path, encoding='utf-8') as file:
+            rows = self.track_progress(
+                reader(file, fields), model.__name__, batch_size
+            )
+            try:
+                if dry_run:
+                    processed = sum(1 for _ in rows)
+                elif options['fast'] and model is Ingredients:
+                    fast_load_ingredients(rows, batch_size)
+                else:
+                    orm_load(
+                        model, rows, batch_size, unique_fields, update_fields
+                    )
+            except (ValueError, KeyError) as error:
+                raise CommandError(f'Ошибка в файле {path}: {error}')
+        if dry_run:
+            self.stdout.write(
+                f'{model.__name__}: dry-run, прочитано {processed} строк.'
+            )
+            return
+        # Массовая загрузка идёт мимо сигналов, кэши сбрасываем сами.
+        bump_reference_versions(model._meta.model_name)
+        self.stdout.write(
+            f'{model.__name__}: новых строк '
+            f'{model.objects.count() - count_before}.'
+        )
+
+    def track_progress(self, rows, name, step):
+        """Пропускает строки насквозь и печатает прогресс и скорость."""
+        start_time = time.monotonic()
+        processed = 0
+        for processed, row in enumerate(rows, 1):
+            yield row
+            if processed % step == 0:
+                self.report_progress(name, processed, start_time)
+        self.report_progress(name, processed, start_time)
+
+    def report_progress(self, name, processed, start_time):
+        elapsed = time.monotonic() - start_time
+        self.stdout.write(
+            f'{name}: обработано {processed} строк, '
+            f'{processed / elapsed if elapsed else 0:.0f} строк/сек.'
+        )
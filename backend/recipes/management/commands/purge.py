@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from api.sync import prune_tombstones
+from recipes import purge
+from recipes.models import Recipes
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Пакетное удаление пользователей и рецептов со всеми связями и '
+            'очистка осиротевших картинок. Запуск: python manage.py purge '
+            '--users 1 2 | --recipes 3 4 | --orphan-images | --tombstones '
+            '| --jobs | --resume JOB.')
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument('--users', type=int, nargs='+')
+        group.add_argument('--recipes', type=int, nargs='+')
+        group.add_argument(
+            '--orphan-images', action='store_true',
+            help='Только удалить картинки без рецептов.'
+        )
+        group.add_argument(
+            '--tombstones', action='store_true',
+            help=('Удалить записи об удалениях для синхронизации старше '
+                  'SYNC_TOMBSTONE_DAYS дней.')
+        )
+        group.add_argument(
+            '--jobs', action='store_true',
+            help='Список фоновых задач удаления и их прогресс.'
+        )
+        group.add_argument(
+            '--resume', metavar='JOB',
+            help=('Продолжить задачу, прерванную перезапуском или падением '
+                  'воркера.')
+        )
+
+    def handle(self, *args, **options):
+        if options['jobs']:
+            return self.show_jobs()
+        if options['orphan_images']:
+            removed = purge.remove_orphan_images(
+                settings.PURGE_IMAGE_GRACE_SECONDS
+            )
+            self.stdout.write(f'Удалено картинок: {removed}.')
+            return
+        if options['tombstones']:
+            removed = prune_tombstones(settings.SYNC_TOMBSTONE_DAYS)
+            self.stdout.write(f'Удалено записей об удалениях: {removed}.')
+            return
+        if options['resume']:
+            job = purge.load_job(options['resume'])
+            if job is None:
+                raise CommandError(f'Задача {options["resume"]} не найдена.')
+            if job['status'] == 'done':
+                raise CommandError('Задача уже выполнена.')
+        else:
+            model, ids = (
+                (User, options['users']) if options['users']
+                else (Recipes, options['recipes'])
+            )
+            if not model.objects.filter(pk__in=ids).exists():
+                raise CommandError('Объекты не найдены.')
+            job = purge.create_job(model, ids)
+        queryset = purge.job_queryset(job)
+        if queryset.model is User:
+            purge.deactivate_users(queryset)
+        job = purge.run_job(job, queryset, self.show_progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово, удалено картинок: {job["orphan_images"]}.'
+        ))
+
+    def show_progress(self, deleted):
+        self.stdout.write(
+            ', '.join(f'{label}: {count}' for label, count in deleted.items())
+        )
+
+    def show_jobs(self):
+        jobs = purge.list_jobs()
+        for job in jobs:
+            self.stdout.write(
+                f'{job["id"]} {job["created"][:19]} {job["model"]} '
+                f'{job["ids"][:5]} {job["status"]}: '
+                f'{sum(job["deleted"].values())} строк'
+            )
+        if not jobs:
+            self.stdout.write('Задач нет.')
@@ -0,0 +1,78 @@
+import os
+import resource
+import sys
+import time
+from collections import Counter
+
+from django.core.management import BaseCommand, CommandError
+
+from recipes.exports import Restore, iter_csv_sections, iter_jsonl, open_text
+from recipes.models import Recipes
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = ('Восстановление каталога из выгрузки export_catalogue: файла '
+            'JSON Lines или каталога csv, сжатых или нет. Существующие '
+            'теги и ингредиенты обновляются. Рецепты восстанавливаются '
+            'с id из выгрузки, поэтому в базу, где уже есть рецепты, '
+            'восстановление выполняется только с --force и перезаписывает '
+            'рецепты с совпадающими id. '
+            'Запуск: python manage.py restore_catalogue PATH.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл .jsonl[.gz], "-" для stdin или каталог csv.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одной пачке и транзакции.'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Восстановить в непустую базу, перезаписав рецепты с '
+                 'теми же id.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        if not options['force'] and Recipes.objects.exists():
+            raise CommandError(
+                'В базе уже есть рецепты, рецепты выгрузки с теми же id '
+                'перезапишут их. Для восстановления поверх укажите --force.'
+            )
+        path = options['path']
+        counts = Counter()
+        start_time = time.monotonic()
+
+        def progress(section, count):
+            counts[section] += count
+            self.stdout.write(
+                f'{section}: восстановлено {counts[section]} строк.'
+            )
+
+        try:
+            if os.path.isdir(path):
+                Restore().load(
+                    iter_csv_sections(path), options['batch_size'], progress
+                )
+            elif path == '-':
+                Restore().load(
+                    iter_jsonl(sys.stdin), options['batch_size'], progress
+                )
+            elif os.path.exists(path):
+                with open_text(path, 'r') as file:
+                    Restore().load(
+                        iter_jsonl(file), options['batch_size'], progress
+                    )
+            else:
+                raise CommandError(f'Файл {path} не найден.')
+        except (ValueError, KeyError) as error:
+            raise CommandError(f'Ошибка в выгрузке {path}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Восстановление завершено за '
+            f'{time.monotonic() - start_time:.2f} сек., пик памяти процесса '
+            f'{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} МБ.'
+        ))
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipes_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipes',
+            name='image',
+            field=models.ImageField(
+                db_index=True,
+                storage=recipes.storage.ContentAddressedStorage(),
+                upload_to='recipes/images/', verbose_name='Картинка'
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipes_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCard',
+            fields=[
+                ('recipe', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    primary_key=True, related_name='card',
+                    serialize=False, to='recipes.recipes',
+                    verbose_name='Рецепт'
+                )),
+                ('data', models.JSONField(verbose_name='Данные')),
+                ('version', models.DateTimeField(
+                    verbose_name='Дата изменения рецепта на момент сборки'
+                )),
+            ],
+            options={
+                'verbose_name': 'карточка рецепта',
+                'verbose_name_plural': 'карточки рецептов',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    ReferenceVersion = apps.get_model('recipes', 'ReferenceVersion')
+    for name in ('tags', 'ingredients'):
+        ReferenceVersion.objects.get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipecard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceVersion',
+            fields=[
+                ('name', models.CharField(
+                    max_length=50, primary_key=True, serialize=False,
+                    verbose_name='Справочник'
+                )),
+                ('version', models.PositiveBigIntegerField(
+                    default=0, verbose_name='Версия'
+                )),
+            ],
+            options={
+                'verbose_name': 'версия справочника',
+                'verbose_name_plural': 'версии справочников',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0005_referenceversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='created',
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now,
+                verbose_name='Дата добавления'
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now,
+                verbose_name='Дата добавления'
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(
+                fields=['user', 'created'], name='cart_user_created_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(
+                fields=['user', 'created'], name='favorite_user_created_idx'
+            ),
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(
+                    auto_created=True, primary_key=True, serialize=False,
+                    verbose_name='ID'
+                )),
+                ('kind', models.CharField(
+                    max_length=20, verbose_name='Тип записи'
+                )),
+                ('object_id', models.PositiveIntegerField(
+                    verbose_name='id рецепта или автора'
+                )),
+                ('deleted', models.DateTimeField(
+                    auto_now_add=True, db_index=True,
+                    verbose_name='Дата удаления'
+                )),
+                ('user', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    to=settings.AUTH_USER_MODEL,
+                    verbose_name='пользователь'
+                )),
+            ],
+            options={
+                'verbose_name': 'удалённая запись',
+                'verbose_name_plural': 'удалённые записи',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(
+                fields=['user', 'deleted'], name='tombstone_user_deleted_idx'
+            ),
+        ),
+    ]
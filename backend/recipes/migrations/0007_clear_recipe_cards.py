@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def clear_cards(apps, schema_editor):
+    # Карточки теперь хранят только id тегов и ингредиентов, старые
+    # пересоберутся при чтении.
+    apps.get_model('recipes', 'RecipeCard').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_cards, migrations.RunPython.noop),
+    ]
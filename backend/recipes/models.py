@@ -4,6 +4,7 @@ from django.db import models
 
 from api.const import (MAX_AMOUNT, MAX_COOKING_TIME, MIN_AMOUNT,
                        MIN_COOKING_TIME, RECIPE_LENGTH)
+from recipes.storage import recipe_image_storage
 from users.models import User
 
 
@@ -63,8 +64,10 @@ class Recipes(models.Model):
         verbose_name='Название рецепта', max_length=RECIPE_LENGTH
     )
     text = models.TextField(verbose_name='Описание')
-    image = models.ImageField(verbose_name='Картинка',
-                              upload_to='recipes/%Y/%m/%d/')
+    image = models.ImageField(
+        verbose_name='Картинка', upload_to='recipes/images/',
+        storage=recipe_image_storage, db_index=True
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления',
         validators=[
@@ -74,6 +77,9 @@ class Recipes(models.Model):
     )
     pub_date = models.DateTimeField(
         verbose_name='Дата публицации', auto_now_add=True)
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения', auto_now=True, db_index=True
+    )
     tags = models.ManyToManyField(Tags, verbose_name='теги')
     ingredients = models.ManyToManyField(
         Ingredients, through='IngredientInRecipe', verbose_name='Ингредиенты'
@@ -97,6 +103,44 @@ class Recipes(models.Model):
         return self.name
 
 
+class RecipeCard(models.Model):
+    """Готовая к отдаче не зависящая от пользователя часть рецепта."""
+
+    recipe = models.OneToOneField(
+        Recipes, on_delete=models.CASCADE, primary_key=True,
+        related_name='card', verbose_name='Рецепт'
+    )
+    data = models.JSONField(verbose_name='Данные')
+    version = models.DateTimeField(
+        verbose_name='Дата изменения рецепта на момент сборки'
+    )
+
+    class Meta:
+        verbose_name = 'карточка рецепта'
+        verbose_name_plural = 'карточки рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id}'
+
+
+class ReferenceVersion(models.Model):
+    """Счётчик изменений справочника для кэшей процессов."""
+
+    name = models.CharField(
+        max_length=50, primary_key=True, verbose_name='Справочник'
+    )
+    version = models.PositiveBigIntegerField(
+        default=0, verbose_name='Версия'
+    )
+
+    class Meta:
+        verbose_name = 'версия справочника'
+        verbose_name_plural = 'версии справочников'
+
+    def __str__(self):
+        return f'{self.name} v{self.version}'
+
+
 class IngredientInRecipe(models.Model):
     """Модель ингредиентов в рецепте"""
 
@@ -137,6 +181,9 @@ class UserRecipe(models.Model):
     recipe = models.ForeignKey(
         Recipes, on_delete=models.CASCADE, verbose_name='Рецепт'
     )
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name='Дата добавления'
+    )
 
     class Meta:
         abstract = True
@@ -146,6 +193,11 @@ class UserRecipe(models.Model):
                 fields=['user', 'recipe'], name='%(class)s_unique'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'created'], name='%(class)s_user_created_idx'
+            )
+        ]
 
     def __str__(self):
         return f'Пользователь:{self.user.username}, рецепт: {self.recipe.name}'
@@ -167,3 +219,30 @@ class Cart(UserRecipe):
         default_related_name = 'cart'
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Список покупок'
+
+
+class Tombstone(models.Model):
+    """Удаление из избранного, корзины или подписок для синхронизации."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name='пользователь'
+    )
+    kind = models.CharField(max_length=20, verbose_name='Тип записи')
+    object_id = models.PositiveIntegerField(
+        verbose_name='id рецепта или автора'
+    )
+    deleted = models.DateTimeField(
+        auto_now_add=True, db_index=True, verbose_name='Дата удаления'
+    )
+
+    class Meta:
+        verbose_name = 'удалённая запись'
+        verbose_name_plural = 'удалённые записи'
+        indexes = [
+            models.Index(
+                fields=['user', 'deleted'], name='tombstone_user_deleted_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
@@ -0,0 +1,225 @@
+"""Пакетное удаление пользователей и рецептов со всеми связями.
+
+Коллектор Django загружает в память все зависимые объекты и шлёт сигналы
+для каждого из них. Здесь связи обходятся по тем же правилам on_delete,
+но строки удаляются пачками по id запросом DELETE ... WHERE id IN (...),
+каждая пачка в своей короткой транзакции, сначала дочерние таблицы,
+затем родительская. Прерванное удаление можно просто запустить заново.
+
+Задача выполняется в фоне, ход работы пишется в файл в PURGE_DIR.
+Задача, оставшаяся в статусе running после перезапуска или падения
+воркера, продолжается командой purge --resume.
+После удаления рецептов с диска убираются картинки, на которые больше
+нет ссылок.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, models, router, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+from recipes.loaders import iter_batches
+from recipes.models import Recipes
+
+IMAGES_DIR = 'recipes'
+ORPHAN_BATCH_SIZE = 500
+
+executor_lock = threading.Lock()
+executor = None
+
+
+class Purge:
+    """Удаление строк queryset и всего, что на них ссылается."""
+
+    def __init__(self, batch_size, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.deleted = Counter()
+
+    def run(self, queryset):
+        model = queryset.model
+        queryset = queryset.order_by()
+        while True:
+            ids = list(
+                queryset.values_list('pk', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                return self.deleted
+            self.delete_batch(model, ids)
+
+    def delete_batch(self, model, ids):
+        using = router.db_for_write(model)
+        for relation in get_candidate_relations_to_delete(model._meta):
+            related = relation.related_model._base_manager.filter(
+                **{f'{relation.field.name}__in': ids}
+            )
+            on_delete = relation.field.remote_field.on_delete
+            if on_delete is models.CASCADE:
+                self.run(related)
+            elif on_delete is models.SET_NULL:
+                with transaction.atomic(using=using):
+                    related.update(**{relation.field.name: None})
+            elif on_delete is not models.DO_NOTHING:
+                # PROTECT, RESTRICT, SET_DEFAULT и SET обрабатывает коллектор.
+                related.delete()
+        with transaction.atomic(using=using):
+            count = model._base_manager.filter(pk__in=ids)._raw_delete(using)
+        self.deleted[model._meta.label] += count
+        if self.progress is not None:
+            self.progress(self.deleted)
+
+
+def remove_orphan_images(grace_seconds, storage=default_storage):
+    """Удаляет картинки рецептов, на которые нет ссылок в БД.
+
+    Файлы моложе grace_seconds не трогаются: рецепт с только что
+    загруженной картинкой может быть ещё не сохранён.
+    """
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    directories = [IMAGES_DIR]
+    while directories:
+        directory = directories.pop()
+        try:
+            subdirectories, files = storage.listdir(directory)
+        except FileNotFoundError:
+            continue
+        directories.extend(
+            f'{directory}/{name}' for name in subdirectories
+        )
+        for batch in iter_batches(
+            (f'{directory}/{name}' for name in files), ORPHAN_BATCH_SIZE
+        ):
+            referenced = set(Recipes.objects.filter(
+                image__in=batch
+            ).values_list('image', flat=True))
+            for path in batch:
+                if (
+                    path not in referenced
+                    and storage.get_modified_time(path).timestamp() < cutoff
+                ):
+                    storage.delete(path)
+                    removed += 1
+    return removed
+
+
+def job_path(job_id):
+    return os.path.join(settings.PURGE_DIR, f'{job_id}.json')
+
+
+def save_job(job):
+    os.makedirs(settings.PURGE_DIR, exist_ok=True)
+    path = job_path(job['id'])
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+        json.dump(job, file, ensure_ascii=False, indent=2)
+    os.replace(f'{path}.tmp', path)
+
+
+def list_jobs():
+    """Задачи удаления, от новых к старым."""
+    if not os.path.isdir(settings.PURGE_DIR):
+        return []
+    jobs = []
+    for name in os.listdir(settings.PURGE_DIR):
+        if name.endswith('.json'):
+            with open(
+                os.path.join(settings.PURGE_DIR, name), encoding='utf-8'
+            ) as file:
+                jobs.append(json.load(file))
+    return sorted(jobs, key=lambda job: job['created'], reverse=True)
+
+
+def load_job(job_id):
+    try:
+        with open(job_path(job_id), encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def job_queryset(job):
+    """Ещё не удалённые строки задачи."""
+    return apps.get_model(job['model'])._base_manager.filter(
+        pk__in=job['ids']
+    )
+
+
+def deactivate_users(queryset):
+    """Сразу отключает удаляемых пользователей.
+
+    Удаление может идти долго, а пачки удаляются без сигналов: save()
+    заранее сбрасывает кэш токенов пользователя.
+    """
+    for user in queryset:
+        user.is_active = False
+        user.save(update_fields=('is_active',))
+
+
+def run_job(job, queryset, progress=None):
+    """Выполняет задачу, сохраняя ход работы после каждой пачки."""
+
+    def report(deleted):
+        job['deleted'] = dict(deleted)
+        save_job(job)
+        if progress is not None:
+            progress(deleted)
+
+    job['status'] = 'running'
+    job.pop('error', None)
+    save_job(job)
+    try:
+        Purge(settings.PURGE_BATCH_SIZE, report).run(queryset)
+        job['orphan_images'] = remove_orphan_images(
+            settings.PURGE_IMAGE_GRACE_SECONDS
+        )
+        job['status'] = 'done'
+    except Exception as error:
+        job['status'] = 'failed'
+        job['error'] = repr(error)
+        raise
+    finally:
+        job['finished'] = datetime.now().isoformat()
+        save_job(job)
+    return job
+
+
+def create_job(model, ids):
+    job = {
+        'id': uuid.uuid4().hex,
+        'model': model._meta.label,
+        'ids': sorted(ids),
+        'status': 'queued',
+        'deleted': {},
+        'created': datetime.now().isoformat(),
+    }
+    save_job(job)
+    return job
+
+
+def background_job(job, queryset):
+    try:
+        run_job(job, queryset)
+    finally:
+        connections.close_all()
+
+
+def enqueue(queryset):
+    """Ставит удаление строк queryset в фоновую очередь процесса."""
+    global executor
+    job = create_job(
+        queryset.model, queryset.values_list('pk', flat=True)
+    )
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(1, thread_name_prefix='purge')
+    executor.submit(background_job, job, job_queryset(job))
+    return job
@@ -0,0 +1,95 @@
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.models import Recipes, ReferenceVersion, Tags
+from recipes.storage import release_image
+
+
+def touch_recipes(recipes):
+    """Обновляет updated_at без сохранения всей модели."""
+    recipes.update(updated_at=timezone.now())
+
+
+def ingredient_row_changed(sender, instance, **kwargs):
+    """Обработчик post_save и post_delete для IngredientInRecipe."""
+    touch_recipes(Recipes.objects.filter(pk=instance.recipe_id))
+
+
+def tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Обработчик m2m_changed для Recipes.tags."""
+    if reverse and action == 'pre_clear':
+        touch_recipes(Recipes.objects.filter(tags=instance))
+    elif action in ('post_add', 'post_remove'):
+        touch_recipes(Recipes.objects.filter(
+            pk__in=pk_set if reverse else [instance.pk]
+        ))
+    elif action == 'post_clear' and not reverse:
+        touch_recipes(Recipes.objects.filter(pk=instance.pk))
+
+
+def tag_changed(sender, instance, created, **kwargs):
+    """Переименование тега меняет ответ у всех его рецептов."""
+    if not created:
+        touch_recipes(Recipes.objects.filter(tags=instance))
+
+
+def ingredient_changed(sender, instance, created, **kwargs):
+    """Переименование ингредиента меняет ответ у всех его рецептов."""
+    if not created:
+        touch_recipes(Recipes.objects.filter(ingredients=instance))
+
+
+def reference_deleted(sender, instance, **kwargs):
+    """pre_delete для Tags и Ingredients.
+
+    Связи с рецептами удаляются каскадом без m2m_changed, поэтому рецепты
+    отмечаются изменёнными заранее, пока связи ещё есть. Сдвиг updated_at
+    меняет их ETag и делает устаревшими карточки.
+    """
+    field = 'tags' if sender is Tags else 'ingredients'
+    touch_recipes(Recipes.objects.filter(**{field: instance}))
+
+
+def bump_reference_versions(*names):
+    """Сдвигает версии справочников, кэши процессов перечитают их."""
+    for name in names:
+        if not ReferenceVersion.objects.filter(name=name).update(
+            version=F('version') + 1
+        ):
+            ReferenceVersion.objects.get_or_create(
+                name=name, defaults={'version': 1}
+            )
+
+
+def reference_changed(sender, **kwargs):
+    """post_save и post_delete для Tags и Ingredients."""
+    bump_reference_versions(sender._meta.model_name)
+
+
+def remember_image(sender, instance, **kwargs):
+    """pre_save: запоминает прежнюю картинку рецепта."""
+    instance._previous_image = Recipes.objects.filter(
+        pk=instance.pk
+    ).values_list('image', flat=True).first() if instance.pk else None
+
+
+def image_changed(sender, instance, **kwargs):
+    """post_save: освобождает заменённую картинку."""
+    previous = getattr(instance, '_previous_image', None)
+    if previous and previous != instance.image.name:
+        release_image(previous)
+
+
+def recipe_deleted(sender, instance, **kwargs):
+    """post_delete: освобождает картинку удалённого рецепта."""
+    release_image(instance.image.name)
+
+
+AUTHOR_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+
+
+def author_changed(sender, instance, created, update_fields=None, **kwargs):
+    """Имя автора входит в ответ по его рецептам."""
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    touch_recipes(Recipes.objects.filter(author=instance))
@@ -0,0 +1,86 @@
+"""Хранилище картинок рецептов с именами по содержимому.
+
+Файл сохраняется как recipes/images/<первые 2 символа>/<sha256>.<ext>,
+поэтому повторная загрузка той же картинки ничего не пишет на диск, а
+URL файла никогда не меняет содержимое и отдаётся nginx с вечным
+кэшем. Ссылками на файл служат строки Recipes.image: файл удаляется,
+когда на него не осталось ни одной ссылки.
+"""
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+IMAGES_DIR = 'recipes/images'
+CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, раскладывающий файлы по sha256 содержимого."""
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            return super().save(name, content, max_length)
+        digest = content_hash(content)
+        extension = os.path.splitext(name)[1].lower()
+        name = f'{IMAGES_DIR}/{digest[:2]}/{digest}{extension}'
+        if self.exists(name):
+            # Свежий mtime защищает файл от сборки мусора, пока запись
+            # со ссылкой на него не закоммичена. Если сборка успела
+            # удалить файл после exists(), он записывается заново.
+            try:
+                os.utime(self.path(name))
+            except FileNotFoundError:
+                pass
+            else:
+                return name
+        return super().save(name, content, max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя означает одинаковое содержимое, перезапись
+        # безопасна.
+        return name
+
+
+recipe_image_storage = ContentAddressedStorage()
+
+
+def reference_count(name):
+    from recipes.models import Recipes
+
+    return Recipes.objects.filter(image=name).count()
+
+
+def release_image(name, storage=recipe_image_storage):
+    """Удаляет файл после коммита, если на него больше нет ссылок.
+
+    Файлы моложе PURGE_IMAGE_GRACE_SECONDS остаются до очистки командой
+    purge --orphan-images: их может ждать незакоммиченная запись.
+    """
+    if not name or not name.startswith(f'{IMAGES_DIR}/'):
+        return
+
+    def collect():
+        if reference_count(name) or not storage.exists(name):
+            return
+        age = time.time() - storage.get_modified_time(name).timestamp()
+        if age >= settings.PURGE_IMAGE_GRACE_SECONDS:
+            storage.delete(name)
+
+    transaction.on_commit(collect)
@@ -1,29 +1,54 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
+from backend.admin import ScalableAdminMixin, count_subquery
+from recipes import purge
+from recipes.models import Recipes
+
 from .models import Subscribe, User
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ScalableAdminMixin, BaseUserAdmin):
     list_display = (
         'id', 'username', 'email', 'first_name', 'last_name',
         'get_recipes_count', 'get_subscriptions_count'
     )
     search_fields = ('username', 'email', 'first_name', 'last_name')
-    list_filter = ('username', 'email', 'first_name', 'last_name', )
+    list_filter = ('is_staff', 'is_superuser', 'is_active')
+    actions = ('purge_in_background',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_count=count_subquery(Recipes, 'author'),
+            subscribers_count=count_subquery(Subscribe, 'author'),
+        )
 
-    @admin.display(description='Количество рецептов')
+    @admin.display(description='Количество рецептов', ordering='recipes_count')
     def get_recipes_count(self, obj):
-        return obj.recipe_author.count()
+        return obj.recipes_count
 
-    @admin.display(description='Количество подписчиков')
+    @admin.display(
+        description='Количество подписчиков', ordering='subscribers_count'
+    )
     def get_subscriptions_count(self, obj):
-        return obj.following.count()
+        return obj.subscribers_count
+
+    @admin.action(
+        description='Удалить в фоне пакетами', permissions=('delete',)
+    )
+    def purge_in_background(self, request, queryset):
+        purge.deactivate_users(queryset)
+        job = purge.enqueue(queryset)
+        self.message_user(
+            request, f'Удаление поставлено в очередь, задача {job["id"]}. '
+            'Ход работы: python manage.py purge --jobs.'
+        )
 
 
 @admin.register(Subscribe)
-class SubscribeAdmin(admin.ModelAdmin):
+class SubscribeAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'author')
-    search_fields = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
     autocomplete_fields = ('user', 'author')
@@ -0,0 +1,27 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_alter_user_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscribe',
+            name='created',
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now,
+                verbose_name='Дата подписки'
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='subscribe',
+            index=models.Index(
+                fields=['user', 'created'], name='subscribe_user_created_idx'
+            ),
+        ),
+    ]
@@ -51,11 +51,19 @@ class Subscribe(models.Model):
         related_name='following',
         verbose_name='Автор'
     )
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name='Дата подписки'
+    )
 
     class Meta:
         ordering = ('id',)
         verbose_name = 'подписчик'
         verbose_name_plural = 'подписчики'
+        indexes = [
+            models.Index(
+                fields=['user', 'created'], name='subscribe_user_created_idx'
+            )
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'], name='unique subscribe'